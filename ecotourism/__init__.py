@@ -0,0 +1 @@
+"""Green Smart Ecotourism AI - backend engines used by main-app.py"""
@@ -0,0 +1,103 @@
+"""OpenRouter chat-completions client with pooled, streaming HTTP"""
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 60.0
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class AIClientError(Exception):
+    """Raised when the chat-completions endpoint returns an error"""
+
+
+def get_http_session():
+    """Process-wide requests session so keep-alive connections are pooled"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def build_messages(system_prompt, query, history=()):
+    """Build the chat message list, with earlier conversation turns before the query"""
+    return [
+        {"role": "system", "content": system_prompt},
+        *history,
+        {"role": "user", "content": query},
+    ]
+
+
+def _post(config, messages, **params):
+    """POST a streaming request to /chat/completions and return the open response"""
+    url = config["base_url"].rstrip("/") + "/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {config['api_key']}",
+        "Content-Type": "application/json",
+        "X-Title": "Green Smart Ecotourism AI",
+    }
+    payload = {"model": config["model"], "messages": messages, "stream": True}
+    payload.update(params)
+    timeout = (
+        config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        config.get("read_timeout", DEFAULT_READ_TIMEOUT),
+    )
+
+    response = get_http_session().post(url, headers=headers, json=payload, stream=True, timeout=timeout)
+    if response.status_code != 200:
+        detail = response.text[:200]
+        response.close()
+        raise AIClientError(f"HTTP {response.status_code}: {detail}")
+    return response
+
+
+def iter_sse_events(response):
+    """Yield decoded JSON payloads from a server-sent events response"""
+    data_lines = []
+    done = False
+    # chunk_size=None hands lines over as soon as the chunk arrives
+    for line in response.iter_lines(chunk_size=None):
+        if done:
+            continue  # drain so the connection goes back to the pool
+        if line:
+            if line.startswith(b":"):
+                continue  # comment / keep-alive
+            if line.startswith(b"data:"):
+                data_lines.append(line[5:].lstrip())
+            continue
+
+        if not data_lines:
+            continue
+        payload = b"\n".join(data_lines)
+        data_lines = []
+        if payload == b"[DONE]":
+            done = True
+            continue
+        yield json.loads(payload)
+
+    if data_lines and data_lines != [b"[DONE]"]:
+        yield json.loads(b"\n".join(data_lines))
+
+
+def stream_chat_completion(config, messages, **params):
+    """Yield content tokens from a streaming chat completion"""
+    response = _post(config, messages, **params)
+    with response:
+        for event in iter_sse_events(response):
+            if "error" in event:
+                raise AIClientError(str(event["error"])[:200])
+            for choice in event.get("choices", []):
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
@@ -0,0 +1,113 @@
+"""Batch analysis: many (query, analysis_type) rows run with bounded concurrency
+
+Requests are I/O bound, so a thread pool overlaps them and a batch takes
+about as long as its slowest requests rather than their sum. A token bucket
+per provider keeps the pool inside the provider's rate limit.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+BATCH_COLUMNS = ['query', 'analysis_type']
+RESULT_COLUMNS = ['row', 'query', 'analysis_type', 'status', 'seconds', 'response']
+
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def read_batch_csv(file, analysis_types, default_type="general"):
+    """(query, analysis_type) rows from an uploaded CSV
+
+    A missing or blank analysis_type falls back to `default_type`; unknown
+    types raise ValueError so a typo doesn't silently run the wrong framework.
+    """
+    df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    if 'query' not in df.columns:
+        raise ValueError("CSV needs a 'query' column")
+    if 'analysis_type' not in df.columns:
+        df['analysis_type'] = default_type
+
+    df = df[BATCH_COLUMNS].apply(lambda column: column.str.strip())
+    df['analysis_type'] = df['analysis_type'].str.lower().replace("", default_type)
+    df = df[df['query'] != ""].reset_index(drop=True)
+
+    unknown = sorted(set(df['analysis_type']) - set(analysis_types))
+    if unknown:
+        raise ValueError(f"Unknown analysis_type: {', '.join(unknown)}")
+    return df
+
+
+def _run_one(analyze, row, query, analysis_type):
+    start = time.perf_counter()
+    try:
+        response, status = analyze(query, analysis_type), "ok"
+    except Exception as e:
+        response, status = "", f"error: {str(e)[:200]}"
+    return {
+        'row': row,
+        'query': query,
+        'analysis_type': analysis_type,
+        'status': status,
+        'seconds': round(time.perf_counter() - start, 3),
+        'response': response
+    }
+
+
+def run_batch(rows, analyze, max_workers=8):
+    """Yield one result dict per row as soon as it completes
+
+    `analyze(query, analysis_type)` runs on a pool of at most max_workers
+    threads; exceptions are recorded in the row's status instead of
+    aborting the batch. The threads have no Streamlit script context, so
+    `analyze` should close over objects resolved by the caller rather than
+    call st.* (st.cache_* getters included).
+    """
+    rows = list(rows)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rows) or 1))) as pool:
+        futures = [pool.submit(_run_one, analyze, i, query, analysis_type)
+                   for i, (query, analysis_type) in enumerate(rows)]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Abandoned early (e.g. the page reran): don't start queued rows
+            for future in futures:
+                future.cancel()
+
+
+def results_frame(results):
+    """Results ordered by input row"""
+    return pd.DataFrame(results, columns=RESULT_COLUMNS).sort_values('row').reset_index(drop=True)
+
+
+def results_to_jsonl(results):
+    """One JSON object per line, in input row order"""
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n"
+                   for record in results_frame(results).to_dict(orient="records"))
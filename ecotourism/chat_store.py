@@ -0,0 +1,183 @@
+"""SQLite chat history with token-budgeted model context
+
+Each message is stored once with its estimated token count. The context
+sent with a new question is the newest turns that fit the budget plus a
+running summary of everything older. Summaries advance in fixed blocks of
+messages, each folded into the previous summary and cached, so a turn
+costs at most one summarization call however long the conversation is.
+
+Conversations are not meant to outlive their browser session; prune()
+drops the ones idle too long, or beyond the most recently active, so the
+file stays bounded.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+SUMMARY_BLOCK = 16
+SUMMARY_TOKENS = 400
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    """Approximate BPE token count: one per word or symbol, more for long words"""
+    pieces = _PIECE.findall(text)
+    return len(pieces) + sum(len(piece) // 8 for piece in pieces if len(piece) > 8)
+
+
+def truncate_tokens(text, max_tokens):
+    """Text cut to about max_tokens at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    return " ".join(words[:max(1, int(max_tokens * 0.75))]) + " …"
+
+
+def format_transcript(summary, messages, max_message_tokens=300):
+    """Previous summary and new turns as text for a summarizer"""
+    lines = [f"Summary so far:\n{summary}\n"] if summary else []
+    lines += [f"{m['role']}: {truncate_tokens(m['content'], max_message_tokens)}" for m in messages]
+    return "\n".join(lines)
+
+
+def extractive_summary(summary, messages, max_tokens=SUMMARY_TOKENS):
+    """Model-free summary: the opening sentence of each question, oldest dropped first"""
+    bullets = summary.splitlines() if summary else []
+    for message in messages:
+        if message['role'] == 'user':
+            first = _SENTENCE_END.split(message['content'].strip(), 1)[0]
+            bullets.append(f"- Asked: {truncate_tokens(first, 40)}")
+    while len(bullets) > 1 and estimate_tokens("\n".join(bullets)) > max_tokens:
+        bullets.pop(0)
+    return "\n".join(bullets)
+
+
+class ChatStore:
+    """Thread-safe conversations keyed by session id, shared by every Streamlit session"""
+
+    def __init__(self, path, summary_block=SUMMARY_BLOCK, summary_tokens=SUMMARY_TOKENS):
+        self.summary_block = summary_block
+        self.summary_tokens = summary_tokens
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " session TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,"
+            " tokens INTEGER NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (session, seq))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " session TEXT NOT NULL, upto INTEGER NOT NULL, content TEXT NOT NULL,"
+            " PRIMARY KEY (session, upto))"
+        )
+
+    def append(self, session, role, content):
+        """Store a message; returns its position in the conversation"""
+        with self._lock:
+            seq = self._db.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session = ?", (session,)
+            ).fetchone()[0]
+            self._db.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                (session, seq, role, content, estimate_tokens(content), time.time())
+            )
+        return seq
+
+    def count(self, session):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session = ?", (session,)
+            ).fetchone()[0]
+
+    def history(self, session, limit=None):
+        """Newest `limit` messages (all if None) as [{'role', 'content'}], oldest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE session = ? ORDER BY seq DESC LIMIT ?",
+                (session, -1 if limit is None else limit)
+            ).fetchall()
+        return [{'role': role, 'content': content} for role, content in reversed(rows)]
+
+    def prune(self, max_age_seconds=None, max_sessions=None):
+        """Delete conversations idle longer than max_age_seconds or beyond the max_sessions most recent; returns how many"""
+        stale = []
+        with self._lock:
+            if max_age_seconds is not None:
+                stale += [row[0] for row in self._db.execute(
+                    "SELECT session FROM messages GROUP BY session HAVING MAX(created_at) < ?",
+                    (time.time() - max_age_seconds,))]
+            if max_sessions is not None:
+                stale += [row[0] for row in self._db.execute(
+                    "SELECT session FROM messages GROUP BY session ORDER BY MAX(created_at) DESC LIMIT -1 OFFSET ?",
+                    (max_sessions,))]
+            stale = sorted(set(stale))
+            for session in stale:
+                self._db.execute("DELETE FROM messages WHERE session = ?", (session,))
+                self._db.execute("DELETE FROM summaries WHERE session = ?", (session,))
+        return len(stale)
+
+    def clear(self, session):
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE session = ?", (session,))
+            self._db.execute("DELETE FROM summaries WHERE session = ?", (session,))
+
+    def context(self, session, budget, summarize):
+        """Chat messages for the model: a summary of older turns plus the newest that fit
+
+        `summarize(summary, messages)` folds a block of messages into the
+        running summary; it is only called for blocks not summarized before.
+        """
+        recent, used = [], 0
+        # A budget below the summary reserve still sends the (truncated) newest turn
+        available = max(budget - self.summary_tokens, 0)
+        with self._lock:
+            # Newest first; the cursor stops reading once the budget is spent
+            for seq, role, content, tokens in self._db.execute(
+                    "SELECT seq, role, content, tokens FROM messages WHERE session = ? ORDER BY seq DESC",
+                    (session,)):
+                if used + tokens > available:
+                    if recent:
+                        break
+                    content = truncate_tokens(content, available)
+                recent.append((seq, role, content))
+                used += tokens
+        if not recent:
+            return []
+
+        # Everything before the first block boundary inside the window is summarized
+        # (aligned so the cached summaries are reused), keeping at least the newest turn
+        start, newest = recent[-1][0], recent[0][0]
+        boundary = min(-(-start // self.summary_block) * self.summary_block, newest)
+        messages = [{'role': role, 'content': content} for seq, role, content in reversed(recent) if seq >= boundary]
+        if boundary == 0:
+            return messages
+        summary = self._summary(session, boundary, summarize)
+        return [{'role': 'system', 'content': f"Summary of the earlier conversation:\n{summary}"}] + messages
+
+    def _summary(self, session, upto, summarize):
+        """Running summary of messages [0, upto), extending the latest cached one"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT upto, content FROM summaries WHERE session = ? AND upto <= ? ORDER BY upto DESC LIMIT 1",
+                (session, upto)
+            ).fetchone()
+        done, summary = row or (0, "")
+        while done < upto:
+            end = min(done + self.summary_block, upto)
+            with self._lock:
+                block = [{'role': role, 'content': content} for role, content in self._db.execute(
+                    "SELECT role, content FROM messages WHERE session = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                    (session, done, end))]
+            summary = truncate_tokens(summarize(summary, block), self.summary_tokens)
+            done = end
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (session, done, summary))
+        return summary
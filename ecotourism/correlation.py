@@ -0,0 +1,253 @@
+"""Vectorized Pearson, Spearman and partial correlations with p-values
+
+StreamingCovariance keeps Welford/Chan running moments so Pearson and
+partial correlations can be updated batch by batch without a full recompute.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from math import lgamma
+
+import numpy as np
+import pandas as pd
+
+_BETACF_ITERATIONS = 200
+_report_cache = OrderedDict()
+_report_cache_lock = threading.Lock()
+REPORT_CACHE_SIZE = 16
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta I_x(a, b) for scalar a, b and array x"""
+    x = np.clip(np.asarray(x, dtype=np.float64), 0.0, 1.0)
+    # Use the symmetry relation where the continued fraction converges fastest
+    flip = x > (a + 1) / (a + b + 2)
+    xs = np.where(flip, 1 - x, x)
+    aa, bb = np.where(flip, b, a), np.where(flip, a, b)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_front = (lgamma(a + b) - lgamma(a) - lgamma(b)) + aa * np.log(xs) + bb * np.log1p(-xs)
+        front = np.exp(log_front) / aa
+
+        # Lentz's algorithm, vectorized over x
+        tiny = 1e-300
+        c = np.ones_like(xs)
+        d = 1 - (aa + bb) * xs / (aa + 1)
+        d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+        h = d.copy()
+        for m in range(1, _BETACF_ITERATIONS + 1):
+            m2 = 2 * m
+            for numerator in (m * (bb - m) * xs / ((aa + m2 - 1) * (aa + m2)),
+                              -(aa + m) * (aa + bb + m) * xs / ((aa + m2) * (aa + m2 + 1))):
+                d = 1 + numerator * d
+                d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+                c = 1 + numerator / c
+                c = np.where(np.abs(c) < tiny, tiny, c)
+                h *= d * c
+        result = front * h
+
+    result = np.where(flip, 1 - result, result)
+    return np.where(x <= 0, 0.0, np.where(x >= 1, 1.0, result))
+
+
+def student_t_pvalues(t, dof):
+    """Two-sided p-values of t statistics"""
+    t = np.asarray(t, dtype=np.float64)
+    if dof <= 0:
+        return np.full_like(t, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        p = _betainc(dof / 2, 0.5, dof / (dof + t ** 2))
+    return np.where(np.isinf(t), 0.0, p)
+
+
+def correlation_pvalues(r, dof):
+    """Two-sided p-values of correlation coefficients via Student's t"""
+    r = np.clip(np.asarray(r, dtype=np.float64), -1.0, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt(dof / (1 - r ** 2)) if dof > 0 else r
+    return np.where(np.abs(r) >= 1, 0.0, student_t_pvalues(t, dof))
+
+
+def pearson_matrix(values):
+    """Pearson correlation of the columns of a 2-D array in one matrix product"""
+    values = np.asarray(values, dtype=np.float64)
+    centered = values - values.mean(axis=0)
+    scale = np.sqrt((centered ** 2).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = centered / scale
+    r = z.T @ z
+    np.fill_diagonal(r, 1.0)
+    return np.clip(r, -1.0, 1.0)
+
+
+def partial_from_correlation(r):
+    """Partial correlations controlling for all other variables"""
+    precision = np.linalg.pinv(r)
+    d = np.sqrt(np.abs(np.diag(precision)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        partial = -precision / np.outer(d, d)
+    np.fill_diagonal(partial, 1.0)
+    return np.clip(partial, -1.0, 1.0)
+
+
+def dataset_fingerprint(df):
+    """Stable content hash of a DataFrame"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update("\x1f".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+def correlation_report(df, columns=None):
+    """Pearson, Spearman and partial correlations with p-values for numeric columns"""
+    columns = list(columns) if columns is not None else list(df.select_dtypes("number").columns)
+    data = df[columns].dropna()
+    n, k = len(data), len(columns)
+    values = data.to_numpy(dtype=np.float64)
+
+    pearson = pearson_matrix(values)
+    spearman = pearson_matrix(data.rank().to_numpy(dtype=np.float64))
+    partial = partial_from_correlation(pearson)
+
+    def frame(matrix):
+        return pd.DataFrame(matrix, index=columns, columns=columns)
+
+    return {
+        'n': n,
+        'pearson': frame(pearson),
+        'pearson_p': frame(correlation_pvalues(pearson, n - 2)),
+        'spearman': frame(spearman),
+        'spearman_p': frame(correlation_pvalues(spearman, n - 2)),
+        'partial': frame(partial),
+        'partial_p': frame(correlation_pvalues(partial, n - k))
+    }
+
+
+def cached_correlation_report(df, columns=None):
+    """correlation_report memoized by dataset fingerprint"""
+    columns = list(columns) if columns is not None else list(df.select_dtypes("number").columns)
+    key = dataset_fingerprint(df[columns])
+    with _report_cache_lock:
+        if key in _report_cache:
+            _report_cache.move_to_end(key)
+            return _report_cache[key]
+
+    report = correlation_report(df, columns)
+    with _report_cache_lock:
+        _report_cache[key] = report
+        while len(_report_cache) > REPORT_CACHE_SIZE:
+            _report_cache.popitem(last=False)
+    return report
+
+
+class StreamingCovariance:
+    """Running mean and co-moment matrix updated batch by batch (Chan et al.)
+
+    `watermark` is the newest key (e.g. month) folded in by update_from, so
+    callers read only rows from that key on. Rows at the watermark itself are
+    read again on every call, since that period may still be filling: their
+    earlier contribution is taken out first. Rows added to periods before
+    the watermark are not picked up.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self.watermark = None
+        self._tail = None  # moments of the rows at the watermark
+        self._lock = threading.RLock()
+
+    def update(self, batch):
+        """Fold a DataFrame or 2-D array of new rows into the running moments"""
+        if isinstance(batch, pd.DataFrame):
+            batch = batch[self.columns].dropna().to_numpy(dtype=np.float64)
+        batch = np.asarray(batch, dtype=np.float64)
+        n_b = len(batch)
+        if n_b == 0:
+            return self
+        mean_b = batch.mean(axis=0)
+        centered = batch - mean_b
+        with self._lock:
+            self._combine(n_b, mean_b, centered.T @ centered)
+        return self
+
+    def update_from(self, load, key):
+        """Fold in load(watermark), the rows whose datetime `key` is at or after the watermark (all when None)"""
+        with self._lock:
+            batch = load(self.watermark)
+            if not len(batch):
+                return self
+            keys = pd.to_datetime(batch[key]).to_numpy()
+            newest = keys.max()
+            if self._tail is not None:
+                self._subtract(self._tail)
+            self.update(batch)
+            self._tail = StreamingCovariance(self.columns).update(batch[keys == newest])
+            self.watermark = pd.Timestamp(newest)
+        return self
+
+    def merge(self, other):
+        """Combine moments computed on a disjoint set of rows"""
+        if other.n:
+            with self._lock:
+                self._combine(other.n, other.mean, other.comoment)
+        return self
+
+    def _combine(self, n_b, mean_b, comoment_b):
+        n_a = self.n
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.comoment = self.comoment + comoment_b + np.outer(delta, delta) * (n_a * n_b / n)
+        self.n = n
+
+    def _subtract(self, part):
+        """Inverse of _combine: remove moments of rows that were folded in earlier"""
+        n = self.n
+        n_a = n - part.n
+        if n_a <= 0:
+            self.n, self.mean, self.comoment = 0, np.zeros_like(self.mean), np.zeros_like(self.comoment)
+            return
+        mean_a = (n * self.mean - part.n * part.mean) / n_a
+        delta = part.mean - mean_a
+        self.comoment = self.comoment - part.comoment - np.outer(delta, delta) * (n_a * part.n / n)
+        self.mean = mean_a
+        self.n = n_a
+
+    def covariance(self):
+        return self.comoment / max(self.n - 1, 1)
+
+    def correlation(self):
+        d = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = self.comoment / np.outer(d, d)
+        np.fill_diagonal(r, 1.0)
+        return pd.DataFrame(np.clip(r, -1.0, 1.0), index=self.columns, columns=self.columns)
+
+    def partial_correlation(self):
+        partial = partial_from_correlation(self.correlation().to_numpy())
+        return pd.DataFrame(partial, index=self.columns, columns=self.columns)
+
+    def pvalues(self):
+        return pd.DataFrame(correlation_pvalues(self.correlation().to_numpy(), self.n - 2),
+                            index=self.columns, columns=self.columns)
+
+    def report(self):
+        """Pearson and partial correlations with p-values, keyed like correlation_report"""
+        with self._lock:
+            pearson, n = self.correlation(), self.n
+        partial = partial_from_correlation(pearson.to_numpy())
+
+        def frame(matrix):
+            return pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+
+        return {
+            'n': n,
+            'pearson': pearson,
+            'pearson_p': frame(correlation_pvalues(pearson.to_numpy(), n - 2)),
+            'partial': frame(partial),
+            'partial_p': frame(correlation_pvalues(partial, n - len(self.columns)))
+        }
@@ -0,0 +1,89 @@
+"""Local stand-in for the OpenRouter /chat/completions endpoint
+
+Run offline with:
+    python -m ecotourism.devserver --port 8765
+    OPENROUTER_API_KEY=local OPENROUTER_BASE_URL=http://127.0.0.1:8765/v1 streamlit run main-app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_reply(messages):
+    """Canned reply echoing the last user message"""
+    query = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    return f"🌿 **Stand-in analysis** for: {query}\n\nThis response was streamed by the local development server."
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """Emulates the OpenAI-compatible chat-completions API"""
+    protocol_version = "HTTP/1.1"
+    token_delay = 0.01
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        reply = make_reply(body.get("messages", []))
+        self.server.request_count += 1
+
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "local-1",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._write_chunk(b": LOCAL PROCESSING\n\n")
+        for token in reply.split(" "):
+            event = {"choices": [{"index": 0, "delta": {"content": token + " "}}]}
+            self._write_chunk(b"data: " + json.dumps(event).encode() + b"\n\n")
+            time.sleep(self.token_delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_server(host="127.0.0.1", port=0):
+    """Start the stand-in server on a background thread and return it"""
+    server = ThreadingHTTPServer((host, port), ChatCompletionsHandler)
+    server.request_count = 0
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), ChatCompletionsHandler)
+    server.request_count = 0
+    print(f"Serving /chat/completions on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,104 @@
+"""Server-side downsampling and binning so charts ship bounded payloads"""
+import numpy as np
+
+MAX_POINTS_PER_TRACE = 2000
+SCATTER_DENSITY_THRESHOLD = 5000
+
+
+def minmax_indices(y, n_out):
+    """Indices of the min and max of each bucket (about n_out points in total)"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    buckets = max(1, n_out // 2)
+    size = -(-n // buckets)  # ceil
+    # Pad with the last value so the final partial bucket reshapes cleanly
+    padded = np.full(buckets * size, y[-1])
+    padded[:n] = y
+    blocks = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(blocks, axis=1)
+    highs = offsets + np.argmax(blocks, axis=1)
+    return np.unique(np.minimum(np.concatenate([[0, n - 1], lows, highs]), n - 1))
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets selection of n_out indices"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    # Bucket edges over the interior points; first and last points are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    # Average of each following bucket, computed up front
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def visible_slice(x, x_range):
+    """Slice of sorted x falling inside x_range (inclusive)"""
+    if x_range is None:
+        return slice(0, len(x))
+    lo, hi = np.searchsorted(x, x_range[0], side="left"), np.searchsorted(x, x_range[1], side="right")
+    return slice(lo, hi)
+
+
+def downsample_xy(x, y, max_points=MAX_POINTS_PER_TRACE, x_range=None, method="minmax"):
+    """(x, y) of at most ~max_points points of sorted x within x_range, indexing the inputs without copying them"""
+    window = visible_slice(x, x_range)
+    x, y = x[window], y[window]
+    idx = lttb_indices(x, y, max_points) if method == "lttb" else minmax_indices(y, max_points)
+    return x[idx], y[idx]
+
+
+def downsample_series(df, x, columns, max_points=MAX_POINTS_PER_TRACE, x_range=None, method="minmax"):
+    """Per-column (x, y) arrays of at most ~max_points points within x_range
+
+    `df` must be sorted by `x`; zooming passes a narrower x_range so the
+    visible window is resampled at higher resolution.
+    """
+    x_values = df[x].to_numpy()
+    window = visible_slice(x_values, x_range)
+    x_values = x_values[window]
+    x_numeric = x_values.astype("datetime64[ns]").astype(np.int64) if np.issubdtype(x_values.dtype, np.datetime64) else x_values
+
+    series = {}
+    for column in columns:
+        y_values = df[column].to_numpy()[window]
+        if method == "lttb":
+            idx = lttb_indices(x_numeric, y_values, max_points)
+        else:
+            idx = minmax_indices(y_values, max_points)
+        series[column] = (x_values[idx], y_values[idx])
+    return series
+
+
+def density_grid(x, y, bins=80, weights=None):
+    """2-D histogram (bin centres and counts) for rendering dense scatters as a heatmap"""
+    counts, x_edges, y_edges = np.histogram2d(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64),
+                                              bins=bins, weights=weights)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+    # Empty bins are left transparent
+    z = np.where(counts > 0, counts, np.nan).T
+    return x_centres, y_centres, z
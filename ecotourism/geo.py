@@ -0,0 +1,106 @@
+"""Grid spatial index over site coordinates for viewport and radius queries"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Vectorized great-circle distance in kilometres"""
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Points bucketed into fixed lat/lon cells and sorted by cell id
+
+    Each row of cells in a query box is one contiguous run of the sorted
+    arrays, found with a binary search, so a query costs
+    O(rows * log n + matches) instead of a full scan. A box crossing the
+    antimeridian (lon_min > lon_max, or a radius reaching past ±180) is
+    searched as two column ranges.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_degrees=0.5):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_degrees = cell_degrees
+        self.n_cols = int(np.ceil(360 / cell_degrees))
+        self.n_rows = int(np.ceil(180 / cell_degrees))
+
+        cells = self._cell_ids(latitudes, longitudes)
+        self.order = np.argsort(cells, kind="stable")
+        self.cells = cells[self.order]
+        self.latitudes = latitudes[self.order]
+        self.longitudes = longitudes[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def _rows(self, latitudes):
+        return np.clip(((np.asarray(latitudes) + 90) // self.cell_degrees).astype(np.int64), 0, self.n_rows - 1)
+
+    def _cols(self, longitudes):
+        return np.clip(((np.asarray(longitudes) + 180) // self.cell_degrees).astype(np.int64), 0, self.n_cols - 1)
+
+    def _cell_ids(self, latitudes, longitudes):
+        return self._rows(latitudes) * self.n_cols + self._cols(longitudes)
+
+    @staticmethod
+    def _lon_spans(lon_min, lon_max):
+        """[(west, east)] longitude spans within [-180, 180] covering the query, split at the antimeridian"""
+        if lon_max - lon_min >= 360:
+            return [(-180.0, 180.0)]
+        if lon_min < -180:
+            return [(lon_min + 360, 180.0), (-180.0, lon_max)]
+        if lon_max > 180:
+            return [(lon_min, 180.0), (-180.0, lon_max - 360)]
+        if lon_min > lon_max:
+            return [(lon_min, 180.0), (-180.0, lon_max)]
+        return [(lon_min, lon_max)]
+
+    def _candidates(self, lat_min, lat_max, lon_min, lon_max):
+        """Sorted-array positions of every point in the cells touching the box"""
+        rows = np.arange(self._rows(lat_min), self._rows(lat_max) + 1)
+        spans = self._lon_spans(lon_min, lon_max)
+        col_lo = np.repeat([self._cols(west) for west, _ in spans], len(rows))
+        col_hi = np.repeat([self._cols(east) for _, east in spans], len(rows))
+        rows = np.tile(rows, len(spans))
+        starts = np.searchsorted(self.cells, rows * self.n_cols + col_lo, side="left")
+        ends = np.searchsorted(self.cells, rows * self.n_cols + col_hi, side="right")
+
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        # Concatenate the [start, end) runs without a Python loop
+        run_offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return np.arange(total) + run_offsets
+
+    def query_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Original row positions of points inside the viewport (lon_min > lon_max crosses the antimeridian)"""
+        pos = self._candidates(lat_min, lat_max, lon_min, lon_max)
+        lat, lon = self.latitudes[pos], self.longitudes[pos]
+        inside = (lat >= lat_min) & (lat <= lat_max) & np.logical_or.reduce(
+            [(lon >= west) & (lon <= east) for west, east in self._lon_spans(lon_min, lon_max)])
+        return np.sort(self.order[pos[inside]])
+
+    def query_radius(self, latitude, longitude, radius_km, return_distance=False):
+        """Original row positions (and distances) of points within radius_km"""
+        d_lat = radius_km / KM_PER_DEGREE
+        d_lon = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(min(abs(latitude) + d_lat, 89.9))), 1e-6))
+        pos = self._candidates(latitude - d_lat, latitude + d_lat, longitude - d_lon, longitude + d_lon)
+
+        distance = haversine_km(latitude, longitude, self.latitudes[pos], self.longitudes[pos])
+        inside = distance <= radius_km
+        rows, distance = self.order[pos[inside]], distance[inside]
+        by_distance = np.argsort(distance, kind="stable")
+        if return_distance:
+            return rows[by_distance], distance[by_distance]
+        return rows[by_distance]
+
+
+def zoom_for_radius(radius_km):
+    """Approximate web-map zoom level that fits a radius on screen"""
+    return float(np.clip(np.log2(40000 / max(radius_km, 0.1)) - 1.5, 1, 16))
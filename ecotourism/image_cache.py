@@ -0,0 +1,193 @@
+"""Content-addressed thumbnails and analysis results for uploaded images
+
+Every image is decoded once: the worker that analyzes it also writes a
+small JPEG thumbnail from the same working copy, and both are stored on
+disk under the SHA-256 of the upload. Later runs, including other sessions
+and restarts, reuse them without decoding the image again.
+
+Byte-identical uploads are found by content hash. Re-encoded or resized
+copies of an already analyzed photo are found by perceptual fingerprint
+and reuse its analysis and thumbnail instead of being analyzed again.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from ecotourism.image_features import analyze_pixels, load_image
+from ecotourism.phash import HashIndex, find_duplicate, fingerprint
+
+THUMBNAIL_SIZE = 400
+# Fresh workers rather than forks of a threaded server process (fork can copy held locks)
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Fingerprints known when a pool started, set in each worker by _set_known
+_known = {}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _set_known(fingerprints, digests):
+    _known['fingerprints'], _known['digests'] = fingerprints, digests
+
+
+def _hex_fingerprint(print_):
+    return [format(int(value), "016x") for value in print_]
+
+
+def process_image(data, thumbnail_path, thumbnail_size=THUMBNAIL_SIZE, known=None):
+    """Analyze image bytes and write their thumbnail (runs in pool workers)
+
+    If the image is a near-duplicate of one in `known` ((fingerprints,
+    digests), default: the pool's snapshot) only
+    {'duplicate_of': digest, 'fingerprint': ...} is returned.
+    """
+    start = time.perf_counter()
+    rgb = load_image(data)
+    print_ = fingerprint(rgb)
+    fingerprints, digests = known or (_known.get('fingerprints'), _known.get('digests'))
+    if fingerprints is not None:
+        original = find_duplicate(fingerprints, digests, print_)
+        if original is not None:
+            return {'duplicate_of': original, 'fingerprint': _hex_fingerprint(print_)}
+
+    analysis = analyze_pixels(rgb, time.perf_counter() - start)
+    analysis['fingerprint'] = _hex_fingerprint(print_)
+
+    thumbnail = Image.fromarray(rgb)
+    thumbnail.thumbnail((thumbnail_size, thumbnail_size), Image.Resampling.BILINEAR)
+    os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+    # Write then rename so a concurrent reader never sees a partial file
+    partial = f"{thumbnail_path}.{os.getpid()}.tmp"
+    thumbnail.save(partial, "JPEG", quality=82)
+    os.replace(partial, thumbnail_path)
+    return analysis
+
+
+class ImageCache:
+    """Analysis results (memory + JSON) and thumbnails (JPEG) keyed by content hash"""
+
+    def __init__(self, directory, thumbnail_size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.thumbnail_size = thumbnail_size
+        self._results = {}
+        self._lock = threading.Lock()
+        self.index = HashIndex(directory)
+
+    def _path(self, digest, suffix):
+        return os.path.join(self.directory, digest[:2], f"{digest}{suffix}")
+
+    def thumbnail_path(self, digest):
+        return self._path(digest, ".jpg")
+
+    def get(self, digest):
+        """Cached analysis, or None if this content was never processed"""
+        with self._lock:
+            if digest in self._results:
+                return self._results[digest]
+        try:
+            with open(self._path(digest, ".json"), encoding="utf-8") as f:
+                analysis = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.thumbnail_path(digest)):
+            return None
+        with self._lock:
+            self._results[digest] = analysis
+        return analysis
+
+    def set(self, digest, analysis):
+        path = self._path(digest, ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(analysis, f)
+        os.replace(partial, path)
+        with self._lock:
+            self._results[digest] = analysis
+
+    def analyze_many(self, items, workers=None):
+        """Yield (index, digest, analysis, cached) for (digest, data) items as each is ready
+
+        `data` is bytes or a file-like object, read only on a cache miss.
+        Cached items come first; the rest (each distinct content once) are
+        fanned out over a process pool when there is more than one to do.
+        Failures yield an analysis of {'error': message} and are not cached.
+        """
+        waiting = {}
+        pending = []
+        for index, (digest, data) in enumerate(items):
+            analysis = self.get(digest)
+            if analysis is not None:
+                yield index, digest, analysis, True
+            elif digest in waiting:
+                waiting[digest].append(index)
+            else:
+                waiting[digest] = [index]
+                pending.append((digest, data.getvalue() if hasattr(data, 'getvalue') else data))
+
+        if not pending:
+            return
+        known = self.index.snapshot()
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        try:
+            if workers <= 1:
+                for digest, data in pending:
+                    analysis = self._process(digest, data, lambda: process_image(
+                        data, self.thumbnail_path(digest), self.thumbnail_size, known))
+                    for index in waiting[digest]:
+                        yield index, digest, analysis, False
+                return
+
+            with ProcessPoolExecutor(workers, mp_context=_MP_CONTEXT, initializer=_set_known,
+                                     initargs=known) as pool:
+                futures = {
+                    pool.submit(process_image, data, self.thumbnail_path(digest), self.thumbnail_size): (digest, data)
+                    for digest, data in pending
+                }
+                for future in as_completed(futures):
+                    digest, data = futures[future]
+                    analysis = self._process(digest, data, future.result)
+                    for index in waiting[digest]:
+                        yield index, digest, analysis, False
+        finally:
+            self.index.save()
+
+    def _process(self, digest, data, run):
+        try:
+            analysis = run()
+            if 'duplicate_of' in analysis:
+                analysis = self._reuse(digest, data, analysis)
+        except Exception as e:
+            return {'error': str(e)}
+        self.set(digest, analysis)
+        self.index.add(digest, [int(value, 16) for value in analysis['fingerprint']])
+        return analysis
+
+    def _reuse(self, digest, data, duplicate):
+        """Analysis and thumbnail of the near-duplicate original, under this digest"""
+        original = self.get(duplicate['duplicate_of'])
+        if original is None or 'error' in original:
+            # Original is gone from the cache: analyze this image after all
+            return process_image(data, self.thumbnail_path(digest), self.thumbnail_size, known=(None, None))
+        os.makedirs(os.path.dirname(self.thumbnail_path(digest)), exist_ok=True)
+        shutil.copyfile(self.thumbnail_path(duplicate['duplicate_of']), self.thumbnail_path(digest))
+        return dict(original, **duplicate)
+
+    def similar(self, digest, k=4):
+        """Up to k (digest, distance, analysis) of the most similar other images"""
+        analysis = self.get(digest)
+        if not analysis or 'fingerprint' not in analysis:
+            return []
+        print_ = [int(value, 16) for value in analysis['fingerprint']]
+        return [(other, distance, self.get(other)) for other, distance in self.index.search(print_, k, exclude=digest)
+                if self.get(other) is not None]
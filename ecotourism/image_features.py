@@ -0,0 +1,142 @@
+"""CPU-only image features and destination classification for uploaded photos
+
+JPEGs are decoded with Pillow's draft mode, which lets the decoder skip
+straight to a 1/2-1/8 scale DCT, so a 12 MP phone photo never materialises
+at full size. Everything after decoding runs on a ~512 px working copy as
+whole-array NumPy operations.
+"""
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageOps
+
+WORKING_SIZE = 512
+
+FEATURE_NAMES = [
+    'green_cover', 'sky_fraction', 'water_fraction', 'earth_tones',
+    'edge_density', 'colorfulness', 'brightness', 'contrast'
+]
+
+# Hand-set logistic weights over FEATURE_NAMES scoring Premium Eco-Resort
+# Location against Cultural Heritage Destination: nature scenes are green,
+# blue and colourful; heritage sites are built, earth-toned and edge-dense.
+# They are not fitted to labelled photos, so the output is a heuristic
+# category score, not a calibrated probability.
+CATEGORIES = ('Premium Eco-Resort Location', 'Cultural Heritage Destination')
+CLASSIFIER_WEIGHTS = np.array([4.0, 2.5, 3.0, -3.5, -6.0, 2.0, 0.0, -1.0])
+CLASSIFIER_BIAS = 0.4
+
+
+def load_image(data, working_size=WORKING_SIZE):
+    """Decode image bytes to an RGB uint8 array no larger than working_size"""
+    image = Image.open(BytesIO(data))
+    if image.format == "JPEG":
+        # Decoder-level downscale by the largest DCT factor (up to 1/8) that
+        # keeps the long side within 3/4 of working_size
+        scale = 8
+        while scale > 1 and max(image.size) / scale < working_size * 0.75:
+            scale //= 2
+        image.draft("RGB", (image.width // scale, image.height // scale))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((working_size, working_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return np.asarray(image)
+
+
+def rgb_to_hsv(rgb):
+    """Hue in degrees, saturation and value in 0-1, for a uint8 RGB array"""
+    rgb = rgb.astype(np.float32) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    value = rgb.max(axis=-1)
+    delta = value - rgb.min(axis=-1)
+    safe = np.where(delta > 0, delta, 1)
+
+    hue = np.where(value == r, (g - b) / safe % 6,
+                   np.where(value == g, (b - r) / safe + 2, (r - g) / safe + 4)) * 60
+    hue = np.where(delta > 0, hue, 0)
+    saturation = np.where(value > 0, delta / np.where(value > 0, value, 1), 0)
+    return hue, saturation, value
+
+
+def extract_features(rgb):
+    """Scene features, each roughly on a 0-1 scale"""
+    hue, saturation, value = rgb_to_hsv(rgb)
+    height = rgb.shape[0]
+    chromatic = (saturation > 0.18) & (value > 0.15)
+
+    green = chromatic & (hue >= 65) & (hue <= 170)
+    blue = (saturation > 0.12) & (value > 0.2) & (hue >= 180) & (hue <= 250)
+    earth = chromatic & (hue >= 10) & (hue <= 50) & (value < 0.85)
+    # Blue in the upper part of the frame reads as sky, lower down as water
+    upper = np.arange(height)[:, None] < height * 0.45
+
+    gray = rgb.astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gx = np.abs(np.diff(gray, axis=1))[:-1, :]
+    gy = np.abs(np.diff(gray, axis=0))[:, :-1]
+    gradient = gx + gy
+
+    rgb_f = rgb.astype(np.float32)
+    rg = rgb_f[..., 0] - rgb_f[..., 1]
+    yb = 0.5 * (rgb_f[..., 0] + rgb_f[..., 1]) - rgb_f[..., 2]
+    # Hasler & Suesstrunk colourfulness, ~0-150 for natural photos
+    colorfulness = np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())
+
+    return {
+        'green_cover': float(green.mean()),
+        'sky_fraction': float((blue & upper).mean()),
+        'water_fraction': float((blue & ~upper).mean()),
+        'earth_tones': float(earth.mean()),
+        'edge_density': float((gradient > 24).mean()),
+        'colorfulness': float(min(colorfulness / 100, 1.5)),
+        'brightness': float(value.mean()),
+        'contrast': float(gray.std() / 128)
+    }
+
+
+def classify(features):
+    """(category, heuristic 0-1 score) from the hand-set logistic scene rule"""
+    x = np.array([features[name] for name in FEATURE_NAMES])
+    p_resort = 1 / (1 + np.exp(-(x @ CLASSIFIER_WEIGHTS + CLASSIFIER_BIAS)))
+    if p_resort >= 0.5:
+        return CATEGORIES[0], float(p_resort)
+    return CATEGORIES[1], float(1 - p_resort)
+
+
+def scene_scores(features):
+    """0-10 tourism potential, sustainability and photo quality from features"""
+    nature = min(features['green_cover'] + features['sky_fraction'] + features['water_fraction'], 1.0)
+    exposure = 1 - 2 * abs(features['brightness'] - 0.5)
+    potential = 0.45 + 0.3 * min(features['colorfulness'], 1.0) + 0.25 * nature
+    sustainability = 0.5 + 0.4 * features['green_cover'] + 0.2 * features['water_fraction'] - 0.2 * features['edge_density']
+    quality = (0.4 * exposure + 0.3 * min(features['contrast'] * 2, 1.0)
+               + 0.3 * min(features['edge_density'] * 10, 1.0))
+    return {
+        'tourism_potential': float(10 * np.clip(potential, 0, 1)),
+        'sustainability_score': float(10 * np.clip(sustainability, 0, 1)),
+        'quality_score': float(10 * np.clip(quality, 0, 1))
+    }
+
+
+def analyze_pixels(rgb, decode_seconds=0.0):
+    """Features, classification and stage timings for a decoded working image"""
+    start = time.perf_counter()
+    features = extract_features(rgb)
+    category, probability = classify(features)
+    feature_seconds = time.perf_counter() - start
+    return {
+        'category': category,
+        'probability': probability,
+        'features': features,
+        'scores': scene_scores(features),
+        'pixels': int(rgb.shape[0] * rgb.shape[1]),
+        'shape': rgb.shape[:2],
+        'timings': {'decode': decode_seconds, 'features': feature_seconds,
+                    'total': decode_seconds + feature_seconds}
+    }
+
+
+def analyze_image(data, working_size=WORKING_SIZE):
+    """Features, classification and measured stage timings for image bytes"""
+    start = time.perf_counter()
+    rgb = load_image(data, working_size)
+    return analyze_pixels(rgb, time.perf_counter() - start)
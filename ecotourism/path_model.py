@@ -0,0 +1,261 @@
+"""Direct/indirect effect path model fitted with batched least squares
+
+Variables are standardized, so coefficients read as "SD change in the
+outcome per SD change in the predictor".
+
+The bootstrap is a Poisson bootstrap: each resample weights every row by a
+Poisson(1) draw, so the weighted Gram matrices of a whole block of
+resamples come out of one matrix product (weights @ row cross-products).
+Every equation's normal equations are sliced from those Gram matrices and
+solved as a batch. Each block draws from its own child of the seed, so the
+draws depend only on the seed, never on how many workers run them. Blocks
+are spread over a process pool, with the row cross-products in shared
+memory, for large datasets.
+"""
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from ecotourism.correlation import student_t_pvalues
+
+PATH_VARIABLES = {
+    'sustainability_score': 'X₁ Sustainability',
+    'satisfaction_score': 'X₂ Satisfaction',
+    'monthly_revenue': 'X₃ Revenue',
+    'carbon_footprint': 'X₄ Environment',
+    'community_impact': 'X₅ Community'
+}
+
+# outcome: predictors
+PATH_MODEL = {
+    'sustainability_score': ['carbon_footprint'],
+    'satisfaction_score': ['sustainability_score', 'community_impact'],
+    'monthly_revenue': ['sustainability_score', 'satisfaction_score']
+}
+
+# Below this many row-resamples the pool costs more than it saves
+PARALLEL_THRESHOLD = 5_000_000
+RESAMPLE_BLOCK = 16
+# Workers start from a clean interpreter: a fork of the threaded app could inherit held locks
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Inverse CDF of Poisson(1) sampled on a 16-bit grid: weights are a table lookup
+_POISSON_CDF = np.cumsum([math.exp(-1) / math.factorial(k) for k in range(16)])
+_POISSON_TABLE = np.searchsorted(_POISSON_CDF, (np.arange(65536) + 0.5) / 65536).astype(np.float32)
+
+_shared = {}
+
+
+def _equations(columns, model):
+    """(outcome index, predictor indices) pairs over the design columns"""
+    position = {column: i for i, column in enumerate(columns)}
+    return [(position[outcome], [position[p] for p in predictors]) for outcome, predictors in model.items()]
+
+
+def _solve_from_gram(gram, equations):
+    """Coefficients of every equation for a stack of Gram matrices (B, p, p)"""
+    coefficients = []
+    for outcome, predictors in equations:
+        xtx = gram[:, predictors][:, :, predictors]
+        xty = gram[:, predictors, outcome]
+        coefficients.append(np.linalg.solve(xtx, xty[..., None])[..., 0])
+    return np.concatenate(coefficients, axis=1)
+
+
+def _cross_products(z):
+    """Upper-triangular row cross-products z_i z_j, one column per (i, j) pair"""
+    rows, cols = np.triu_indices(z.shape[1])
+    return (z[:, rows] * z[:, cols]).astype(np.float32)
+
+
+def _resample_blocks(seed, n_resamples):
+    """(seed sequence, size) per block of RESAMPLE_BLOCK resamples"""
+    sizes = [min(RESAMPLE_BLOCK, n_resamples - start) for start in range(0, n_resamples, RESAMPLE_BLOCK)]
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def _bootstrap_chunk(products, p, equations, blocks):
+    """Coefficients for the Poisson-bootstrap resamples of each (seed, size) block"""
+    n = len(products)
+    rows, cols = np.triu_indices(p)
+    grams = np.empty((sum(size for _, size in blocks), p, p))
+    start = 0
+    for seed, size in blocks:
+        rng = np.random.default_rng(seed)
+        weights = _POISSON_TABLE[rng.integers(0, 65536, (size, n), dtype=np.uint16)]
+        flat = (weights @ products).astype(np.float64)
+        grams[start:start + size, rows, cols] = flat
+        grams[start:start + size, cols, rows] = flat
+        start += size
+    return _solve_from_gram(grams, equations)
+
+
+def _attach_shared(name, shape):
+    """Pool initializer: map the row cross-products from shared memory"""
+    block = shared_memory.SharedMemory(name=name)
+    _shared['block'] = block
+    _shared['products'] = np.ndarray(shape, dtype=np.float32, buffer=block.buf)
+
+
+def _bootstrap_shared(args):
+    p, equations, blocks = args
+    return _bootstrap_chunk(_shared['products'], p, equations, blocks)
+
+
+def bootstrap_coefficients(z, equations, n_resamples=1000, seed=0, workers=None):
+    """(n_resamples, n_coefficients) bootstrap draws, in parallel when worthwhile"""
+    workers = workers or os.cpu_count() or 1
+    products = _cross_products(z)
+    p = z.shape[1]
+    blocks = _resample_blocks(seed, n_resamples)
+
+    if workers == 1 or len(z) * n_resamples < PARALLEL_THRESHOLD:
+        return _bootstrap_chunk(products, p, equations, blocks)
+
+    # Contiguous runs of blocks per task keep the draws in seed order
+    bounds = np.linspace(0, len(blocks), min(workers, len(blocks)) + 1).astype(int)
+    block = shared_memory.SharedMemory(create=True, size=products.nbytes)
+    try:
+        np.ndarray(products.shape, dtype=np.float32, buffer=block.buf)[:] = products
+        with ProcessPoolExecutor(workers, mp_context=_MP_CONTEXT, initializer=_attach_shared,
+                                 initargs=(block.name, products.shape)) as pool:
+            tasks = [(p, equations, blocks[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+            return np.concatenate(list(pool.map(_bootstrap_shared, tasks)))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def indirect_paths(model):
+    """All two-step mediated paths X -> M -> Y in the model"""
+    paths = []
+    for mediator, predictors in model.items():
+        for outcome, outcome_predictors in model.items():
+            if mediator in outcome_predictors:
+                paths.extend((source, mediator, outcome) for source in predictors)
+    return paths
+
+
+def fit_path_model(df, model=PATH_MODEL, n_resamples=1000, seed=0, workers=None, confidence=0.95):
+    """Fit direct and indirect effects with bootstrap confidence intervals"""
+    columns = list(dict.fromkeys([c for outcome, ps in model.items() for c in [outcome, *ps]]))
+    data = df[columns].dropna().to_numpy(dtype=np.float64)
+    n = len(data)
+    z = (data - data.mean(axis=0)) / data.std(axis=0, ddof=1)
+    equations = _equations(columns, model)
+
+    # Point estimates and classical standard errors via QR-based lstsq
+    rows, r2 = [], {}
+    for (outcome, predictors), outcome_name in zip(equations, model):
+        x, y = z[:, predictors], z[:, outcome]
+        beta, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
+        residuals = y - x @ beta
+        dof = n - len(predictors) - 1
+        sigma2 = residuals @ residuals / dof
+        se = np.sqrt(np.diag(sigma2 * np.linalg.inv(x.T @ x)))
+        p_values = student_t_pvalues(beta / se, dof)
+        r2[outcome_name] = 1 - residuals @ residuals / (y @ y)
+        for i, predictor in enumerate(predictors):
+            rows.append({'outcome': outcome_name, 'predictor': columns[predictor],
+                         'beta': beta[i], 'se': se[i], 'p_value': p_values[i]})
+    direct = pd.DataFrame(rows)
+
+    draws = bootstrap_coefficients(z, equations, n_resamples, seed, workers)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(draws, [alpha, 1 - alpha], axis=0)
+    direct['ci_low'], direct['ci_high'] = low, high
+
+    # Indirect effects are products of path coefficients, bootstrapped jointly
+    index = {(r.outcome, r.predictor): i for i, r in enumerate(direct.itertuples())}
+    indirect_rows = []
+    for source, mediator, outcome in indirect_paths(model):
+        a, b = index[(mediator, source)], index[(outcome, mediator)]
+        effect_draws = draws[:, a] * draws[:, b]
+        indirect_rows.append({
+            'source': source, 'mediator': mediator, 'outcome': outcome,
+            'effect': direct['beta'][a] * direct['beta'][b],
+            'ci_low': np.quantile(effect_draws, alpha),
+            'ci_high': np.quantile(effect_draws, 1 - alpha),
+            # Share of resamples on the other side of zero, two-sided
+            'p_value': min(1.0, 2 * min((effect_draws <= 0).mean(), (effect_draws >= 0).mean()))
+        })
+
+    return {
+        'n': n,
+        'n_resamples': n_resamples,
+        'confidence': confidence,
+        'direct': direct,
+        'indirect': pd.DataFrame(indirect_rows),
+        'r2': r2
+    }
+
+
+def _label(column):
+    return PATH_VARIABLES.get(column, column)
+
+
+def _significance(p):
+    if p < 0.001:
+        return "p < 0.001"
+    if p < 0.01:
+        return "p < 0.01"
+    if p < 0.05:
+        return "p < 0.05"
+    return f"p = {p:.2f}, not significant"
+
+
+def _strength(beta):
+    size = abs(beta)
+    return "Very Large" if size >= 0.5 else "Large" if size >= 0.3 else "Medium" if size >= 0.1 else "Small"
+
+
+def format_path_analysis(result, means=None):
+    """Markdown narrative filled in from a fitted path model"""
+    level = int(result['confidence'] * 100)
+    lines = ["📈 **INTRA-VARIABLE DIRECT EFFECT ANALYSIS**", ""]
+
+    if means:
+        lines += ["**🔗 VARIABLE RELATIONSHIP MATRIX**", "", "**Primary Variables (sample means):**"]
+        lines += [f"- **{_label(c)}:** {v:,.2f}" for c, v in means.items()]
+        lines.append("")
+
+    lines += ["**DIRECT EFFECT COEFFICIENTS (standardized):**", ""]
+    for row in result['direct'].itertuples():
+        direction = "increase" if row.beta >= 0 else "decrease"
+        lines += [
+            f"**{_label(row.predictor)} → {_label(row.outcome)}**",
+            f"- **Coefficient:** β = {row.beta:+.2f} ({_significance(row.p_value)}), SE = {row.se:.3f}",
+            f"- **Effect Size:** {_strength(row.beta)}",
+            f"- **Interpretation:** 1 SD higher {_label(row.predictor).split(' ', 1)[1].lower()} = "
+            f"{abs(row.beta):.2f} SD {direction} in {_label(row.outcome).split(' ', 1)[1].lower()}",
+            f"- **Confidence Interval:** [{row.ci_low:.2f}, {row.ci_high:.2f}] at {level}% (bootstrap)",
+            ""
+        ]
+
+    lines += ["**MEDIATION ANALYSIS:**"]
+    for row in result['indirect'].itertuples():
+        significant = "significant" if row.ci_low > 0 or row.ci_high < 0 else "not significant"
+        lines.append(
+            f"- **{_label(row.source).split(' ')[0]} → {_label(row.mediator).split(' ')[0]} → "
+            f"{_label(row.outcome).split(' ')[0]}:** Indirect effect = {row.effect:+.2f} "
+            f"[{row.ci_low:.2f}, {row.ci_high:.2f}] ({significant})"
+        )
+    for outcome, r2 in result['r2'].items():
+        lines.append(f"- **Variance Explained ({_label(outcome)}):** R² = {r2:.2f}")
+
+    strongest = result['direct'].loc[result['direct']['beta'].abs().idxmax()]
+    lines += [
+        "",
+        "**OPTIMIZATION RECOMMENDATIONS:**",
+        f"1. **Priority:** {_label(strongest.predictor)} has the strongest direct effect "
+        f"(β = {strongest.beta:+.2f} on {_label(strongest.outcome)})",
+        f"2. **Evidence Base:** {result['n']:,} site-months, {result['n_resamples']:,} bootstrap resamples",
+        "3. **Monitoring:** Re-fit as new monthly data arrives to track coefficient drift"
+    ]
+    return "\n".join(lines)
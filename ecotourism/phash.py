@@ -0,0 +1,165 @@
+"""Perceptual image fingerprints and a vectorized Hamming-distance index
+
+A fingerprint is two packed 64-bit hashes, pHash (low DCT frequencies
+against their median) and dHash (horizontal brightness gradients), so
+resized, recompressed or slightly re-exposed copies of a photo land within
+a few bits of each other. Fingerprints are stored column-wise, as a (2, n)
+uint64 array, so searching is an XOR and popcount over two contiguous
+columns.
+"""
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+FINGERPRINT_BITS = 128
+# Combined pHash + dHash distance at or below which two images are the same view
+DUPLICATE_DISTANCE = 12
+
+_DCT_SIZE = 32
+# Orthonormal DCT-II basis: dct2(x) = D @ x @ D.T
+_k = np.arange(_DCT_SIZE)
+_DCT = np.sqrt(2 / _DCT_SIZE) * np.cos(np.pi * (2 * _k[None, :] + 1) * _k[:, None] / (2 * _DCT_SIZE))
+_DCT[0] /= np.sqrt(2)
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _gray(rgb, size):
+    image = Image.fromarray(np.asarray(rgb, dtype=np.uint8)).convert("L")
+    return np.asarray(image.resize(size, Image.Resampling.BILINEAR), dtype=np.float64)
+
+
+def _pack(bits):
+    return np.packbits(bits.ravel()).view(">u8")[0].astype(np.uint64)
+
+
+def phash(rgb):
+    """64-bit DCT hash"""
+    coefficients = _DCT @ _gray(rgb, (_DCT_SIZE, _DCT_SIZE)) @ _DCT.T
+    low = coefficients[:8, :8].ravel()
+    # The DC term only encodes overall brightness
+    return _pack(low > np.median(low[1:]))
+
+
+def dhash(rgb):
+    """64-bit gradient hash"""
+    gray = _gray(rgb, (9, 8))
+    return _pack(gray[:, 1:] > gray[:, :-1])
+
+
+def fingerprint(rgb):
+    return np.array([phash(rgb), dhash(rgb)], dtype=np.uint64)
+
+
+def popcount(values):
+    """Set bits per element of a uint64 array"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def hamming_distances(fingerprints, query):
+    """Bit distance (uint8) from query to every column of a (2, n) fingerprint array"""
+    query = np.asarray(query, dtype=np.uint64)
+    return popcount(fingerprints[0] ^ query[0]) + popcount(fingerprints[1] ^ query[1])
+
+
+def nearest_k(distances, k):
+    """Positions of the k smallest distances, nearest first
+
+    Distances are small integers, so a histogram finds the cut-off in one
+    pass instead of a partial sort.
+    """
+    k = min(k, len(distances))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    cut = int(np.searchsorted(np.cumsum(np.bincount(distances, minlength=FINGERPRINT_BITS + 1)), k))
+    candidates = np.flatnonzero(distances <= cut)
+    return candidates[np.argsort(distances[candidates], kind="stable")][:k]
+
+
+class HashIndex:
+    """Append-only fingerprints with their image content hashes, saved as .npy files"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._fingerprints = np.empty((2, 1024), dtype=np.uint64)
+        self._digests = np.empty((1024, 32), dtype=np.uint8)
+        self._size = 0
+        self._lock = threading.Lock()
+        if directory:
+            self._load()
+
+    def __len__(self):
+        return self._size
+
+    def _paths(self):
+        return (os.path.join(self.directory, "fingerprints.npy"),
+                os.path.join(self.directory, "fingerprint_digests.npy"))
+
+    def _load(self):
+        fingerprints_path, digests_path = self._paths()
+        try:
+            fingerprints, digests = np.load(fingerprints_path), np.load(digests_path)
+        except (OSError, ValueError):
+            return
+        size = min(fingerprints.shape[1], len(digests))
+        self._grow(size)
+        self._fingerprints[:, :size], self._digests[:size] = fingerprints[:, :size], digests[:size]
+        self._size = size
+
+    def _grow(self, needed):
+        capacity = len(self._digests)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        fingerprints = np.empty((2, capacity), dtype=np.uint64)
+        digests = np.empty((capacity, 32), dtype=np.uint8)
+        fingerprints[:, :self._size] = self._fingerprints[:, :self._size]
+        digests[:self._size] = self._digests[:self._size]
+        self._fingerprints, self._digests = fingerprints, digests
+
+    def add(self, digest, print_):
+        """Store the fingerprint of the image with hex content hash `digest`"""
+        with self._lock:
+            self._grow(self._size + 1)
+            self._fingerprints[:, self._size] = print_
+            self._digests[self._size] = np.frombuffer(bytes.fromhex(digest), dtype=np.uint8)
+            self._size += 1
+
+    def snapshot(self):
+        """(fingerprints, digests) arrays as of now, safe to hand to other processes"""
+        with self._lock:
+            return self._fingerprints[:, :self._size].copy(), self._digests[:self._size].copy()
+
+    def search(self, print_, k=5, exclude=None):
+        """Up to k (hex digest, distance) pairs, nearest first"""
+        with self._lock:
+            distances = hamming_distances(self._fingerprints[:, :self._size], print_)
+            found = [(self._digests[i].tobytes().hex(), int(distances[i]))
+                     for i in nearest_k(distances, k + (exclude is not None))]
+        return [(digest, distance) for digest, distance in found if digest != exclude][:k]
+
+    def save(self):
+        if not self.directory:
+            return
+        fingerprints, digests = self.snapshot()
+        os.makedirs(self.directory, exist_ok=True)
+        for path, values in zip(self._paths(), (fingerprints, digests)):
+            partial = f"{path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as f:
+                np.save(f, values)
+            os.replace(partial, path)
+
+
+def find_duplicate(fingerprints, digests, print_, max_distance=DUPLICATE_DISTANCE):
+    """Hex digest of the closest stored image within max_distance, or None"""
+    if fingerprints.shape[1] == 0:
+        return None
+    distances = hamming_distances(fingerprints, print_)
+    nearest = int(np.argmin(distances))
+    return digests[nearest].tobytes().hex() if distances[nearest] <= max_distance else None
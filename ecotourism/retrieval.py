@@ -0,0 +1,312 @@
+"""Local BM25 retrieval over our own documents (reports, regulations, site audits)
+
+Documents are split into overlapping word-window chunks and indexed in
+segments. A segment is an immutable inverted index stored as .npy arrays
+in CSR layout (term -> doc ids and term frequencies) and opened
+memory-mapped, so the OS pages in only the postings a query touches.
+
+Builds are incremental. Only new or changed files are chunked, into a new
+segment. Chunks of changed or deleted files are masked out of their old
+segment, and segments are merged once there are too many of them.
+
+Build or refresh an index from the command line with:
+    python -m ecotourism.retrieval knowledge/ .cache/knowledge_index
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+DOCUMENT_EXTENSIONS = ('.txt', '.md', '.markdown')
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+MAX_SEGMENTS = 8
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(text, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Overlapping windows of about `words` words, not crossing blank-line paragraphs unless short"""
+    chunks, current = [], []
+    for paragraph in re.split(r"\n\s*\n", text):
+        tokens = paragraph.split()
+        while tokens:
+            room = words - len(current)
+            current.extend(tokens[:room])
+            tokens = tokens[room:]
+            if len(current) >= words:
+                chunks.append(" ".join(current))
+                current = current[-overlap:] if tokens else []
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _iter_documents(directory):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+class Segment:
+    """One immutable inverted index, memory-mapped from its directory"""
+
+    def __init__(self, path):
+        self.path = path
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        self.indptr, self.docs, self.tf = load("indptr"), load("docs"), load("tf")
+        self.doc_lengths, self.offsets = load("doc_lengths"), load("offsets")
+        chunks_path = os.path.join(path, "chunks.jsonl")
+        # Mapped rather than reopened per read, so a search still completes if a
+        # merge deletes this segment meanwhile
+        self._chunks = np.memmap(chunks_path, dtype=np.uint8, mode="r") if os.path.getsize(chunks_path) else b""
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            self.vocabulary = {term: i for i, term in enumerate(json.load(f))}
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def postings(self, term):
+        """(doc ids, term frequencies) of a term, empty if absent"""
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return self.docs[:0], self.tf[:0]
+        lo, hi = self.indptr[term_id], self.indptr[term_id + 1]
+        return self.docs[lo:hi], self.tf[lo:hi]
+
+    def chunk(self, doc):
+        """Stored {'source', 'text'} of a chunk"""
+        return json.loads(bytes(self._chunks[self.offsets[doc]:self.offsets[doc + 1]]))
+
+    def chunks(self):
+        for doc in range(len(self)):
+            yield self.chunk(doc)
+
+    @staticmethod
+    def write(path, records):
+        """Index [{'source', 'text'}] records into a new segment directory"""
+        vocabulary = {}
+        term_ids, doc_ids, lengths = [], [], []
+        for doc, record in enumerate(records):
+            ids = [vocabulary.setdefault(t, len(vocabulary)) for t in tokenize(record['text'])]
+            term_ids.append(np.asarray(ids, dtype=np.int64))
+            doc_ids.append(np.full(len(ids), doc, dtype=np.int64))
+            lengths.append(len(ids))
+
+        n_docs = len(records)
+        terms = np.concatenate(term_ids) if term_ids else np.empty(0, dtype=np.int64)
+        docs = np.concatenate(doc_ids) if doc_ids else np.empty(0, dtype=np.int64)
+        # Sorting (term, doc) pairs groups postings by term; run lengths are the tf
+        pairs, tf = np.unique(terms * max(n_docs, 1) + docs, return_counts=True)
+        posting_terms, posting_docs = np.divmod(pairs, max(n_docs, 1))
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(vocabulary)), out=indptr[1:])
+
+        os.makedirs(path, exist_ok=True)
+        offsets = []
+        with open(os.path.join(path, "chunks.jsonl"), "wb") as f:
+            for record in records:
+                offsets.append(f.tell())
+                f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            offsets.append(f.tell())
+        arrays = {
+            'indptr': indptr,
+            'docs': posting_docs.astype(np.int32),
+            'tf': np.minimum(tf, np.iinfo(np.uint16).max).astype(np.uint16),
+            'doc_lengths': np.asarray(lengths, dtype=np.uint32),
+            'offsets': np.asarray(offsets, dtype=np.int64)
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), values)
+        with open(os.path.join(path, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(list(vocabulary), f, ensure_ascii=False)
+
+
+class KnowledgeIndex:
+    """Segmented BM25 index with an incremental update from a document directory"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._open()
+
+    # Manifest: segments in order, live chunk ranges per source file, masked ranges per segment
+    def _manifest_path(self):
+        return os.path.join(self.index_dir, "manifest.json")
+
+    def _open(self):
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {'version': 0, 'next_segment': 0, 'segments': [], 'files': {}, 'deleted': {}}
+        self.segments = [Segment(os.path.join(self.index_dir, name)) for name in self.manifest['segments']]
+        self.masks = []
+        for name, segment in zip(self.manifest['segments'], self.segments):
+            mask = np.zeros(len(segment), dtype=bool)
+            for start, end in self.manifest['deleted'].get(name, []):
+                mask[start:end] = True
+            self.masks.append(mask)
+        live = [np.asarray(s.doc_lengths)[~m] for s, m in zip(self.segments, self.masks)]
+        self.n_chunks = int(sum(len(lengths) for lengths in live))
+        self.average_length = float(np.concatenate(live).mean()) if self.n_chunks else 0.0
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    def stats(self):
+        return {'chunks': self.n_chunks, 'documents': len(self.manifest['files']),
+                'segments': len(self.segments), 'version': self.version}
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.index_dir, exist_ok=True)
+        partial = f"{self._manifest_path()}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(partial, self._manifest_path())
+
+    def update(self, documents_dir):
+        """Index new and changed files, mask changed and removed ones; returns chunks added"""
+        with self._lock:
+            manifest = json.loads(json.dumps(self.manifest))
+            current = {path: _file_signature(path) for path in _iter_documents(documents_dir)} \
+                if os.path.isdir(documents_dir) else {}
+
+            stale = [path for path, entry in manifest['files'].items()
+                     if current.get(path) != entry['signature']]
+            fresh = [path for path, signature in current.items()
+                     if path not in manifest['files'] or manifest['files'][path]['signature'] != signature]
+            if not stale and not fresh:
+                return 0
+
+            for path in stale:
+                entry = manifest['files'].pop(path)
+                manifest['deleted'].setdefault(entry['segment'], []).append(entry['chunks'])
+
+            records, ranges = [], {}
+            for path in fresh:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    chunks = chunk_text(f.read())
+                ranges[path] = [len(records), len(records) + len(chunks)]
+                records.extend({'source': os.path.relpath(path, documents_dir), 'text': c} for c in chunks)
+
+            if records:
+                name = f"segment_{manifest['next_segment']:06d}"
+                manifest['next_segment'] += 1
+                Segment.write(os.path.join(self.index_dir, name), records)
+                manifest['segments'].append(name)
+                for path in fresh:
+                    manifest['files'][path] = {'signature': current[path], 'segment': name, 'chunks': ranges[path]}
+
+            written = set(manifest['segments'])
+            if len(manifest['segments']) > MAX_SEGMENTS:
+                manifest = self._merge(manifest)
+
+            manifest['version'] += 1
+            retired = written - set(manifest['segments'])
+            self._save_manifest(manifest)
+            self._open()
+            for name in retired:
+                shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+            return len(records)
+
+    def _merge(self, manifest):
+        """Rewrite every live chunk into one segment, dropping masked ones"""
+        records, files = [], {}
+        by_segment = {}
+        for path, entry in manifest['files'].items():
+            by_segment.setdefault(entry['segment'], []).append((path, entry))
+        for name in manifest['segments']:
+            segment = Segment(os.path.join(self.index_dir, name))
+            stored = list(segment.chunks())
+            for path, entry in by_segment.get(name, []):
+                start, end = entry['chunks']
+                files[path] = dict(entry, chunks=[len(records), len(records) + end - start])
+                records.extend(stored[start:end])
+
+        name = f"segment_{manifest['next_segment']:06d}"
+        manifest['next_segment'] += 1
+        Segment.write(os.path.join(self.index_dir, name), records)
+        for entry in files.values():
+            entry['segment'] = name
+        return dict(manifest, segments=[name], files=files, deleted={})
+
+    def search(self, query, k=4):
+        """Top-k [{'source', 'text', 'score'}] chunks by BM25"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            segments, masks = self.segments, self.masks
+            n, average_length = self.n_chunks, self.average_length
+        if not terms or n == 0:
+            return []
+
+        postings = [[segment.postings(term) for term in terms] for segment in segments]
+        df = np.array([sum(len(p[i][0]) for p in postings) for i in range(len(terms))], dtype=np.float64)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+        candidates = []
+        for segment, mask, segment_postings in zip(segments, masks, postings):
+            docs = [d for d, _ in segment_postings]
+            if not any(len(d) for d in docs):
+                continue
+            docs_all = np.concatenate(docs).astype(np.int64)
+            tf = np.concatenate([t for _, t in segment_postings]).astype(np.float64)
+            weights = np.repeat(idf, [len(d) for d in docs])
+            lengths = np.asarray(segment.doc_lengths)[docs_all]
+            # BM25 term weights summed per chunk: a sparse (chunk x term) product
+            contribution = weights * tf * (BM25_K1 + 1) / (
+                tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length))
+            scores = np.bincount(docs_all, contribution, minlength=len(segment))
+            scores[mask] = 0
+            top = np.argpartition(scores, -min(k, len(scores)))[-k:]
+            candidates.extend((float(scores[d]), segment, int(d)) for d in top if scores[d] > 0)
+
+        candidates.sort(key=lambda c: -c[0])
+        return [dict(segment.chunk(doc), score=score) for score, segment, doc in candidates[:k]]
+
+
+def format_passages(passages, max_chars=700):
+    """Numbered passages with sources, for a system prompt or a response footer"""
+    return "\n\n".join(
+        f"[{i}] ({p['source']}) {p['text'][:max_chars]}{'…' if len(p['text']) > max_chars else ''}"
+        for i, p in enumerate(passages, 1)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("documents")
+    parser.add_argument("index_dir")
+    parser.add_argument("--query")
+    args = parser.parse_args()
+
+    index = KnowledgeIndex(args.index_dir)
+    start = time.perf_counter()
+    added = index.update(args.documents)
+    print(f"Indexed {added:,} new chunks in {time.perf_counter() - start:.1f}s: {index.stats()}")
+    if args.query:
+        start = time.perf_counter()
+        results = index.search(args.query)
+        print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+        print(format_passages(results))
@@ -0,0 +1,147 @@
+"""PESTEL and VRIO scores computed from weighted site indicators
+
+Every indicator is mapped onto 0-1 with a fixed reference range (not the
+range of the current batch), so a site's scores depend only on its own row.
+That is what lets ScoringEngine memoize results per site and re-score only
+the sites whose indicators changed.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# indicator: (worst, best); worst > best means lower is better
+INDICATOR_RANGES = {
+    'sustainability_score': (5.0, 10.0),
+    'satisfaction_score': (5.0, 10.0),
+    'community_impact': (5.0, 10.0),
+    'carbon_footprint': (2.5, 0.0),
+    'innovation_index': (50.0, 100.0),
+    'education_programs': (0.0, 30.0),
+    'monthly_visitors': (0.0, 50000.0),
+    'revenue_per_visitor': (10.0, 40.0)
+}
+
+# Indicators computed from other columns: name -> (numerator, denominator)
+DERIVED_INDICATORS = {
+    'revenue_per_visitor': ('monthly_revenue', 'monthly_visitors')
+}
+
+PESTEL_WEIGHTS = {
+    'Political': {'community_impact': 0.5, 'education_programs': 0.3, 'sustainability_score': 0.2},
+    'Economic': {'revenue_per_visitor': 0.4, 'monthly_visitors': 0.3, 'satisfaction_score': 0.3},
+    'Social': {'satisfaction_score': 0.4, 'community_impact': 0.4, 'education_programs': 0.2},
+    'Technological': {'innovation_index': 0.8, 'education_programs': 0.2},
+    'Environmental': {'sustainability_score': 0.5, 'carbon_footprint': 0.5},
+    'Legal': {'sustainability_score': 0.4, 'carbon_footprint': 0.3, 'community_impact': 0.3}
+}
+
+VRIO_WEIGHTS = {
+    'Value': {'satisfaction_score': 0.4, 'revenue_per_visitor': 0.3, 'monthly_visitors': 0.3},
+    'Rarity': {'sustainability_score': 0.4, 'innovation_index': 0.3, 'carbon_footprint': 0.3},
+    'Imitability': {'community_impact': 0.5, 'education_programs': 0.5},
+    'Organization': {'innovation_index': 0.4, 'sustainability_score': 0.3, 'education_programs': 0.3}
+}
+
+SCORE_COLUMNS = ('pestel_score', 'vrio_advantage')
+
+
+def indicator_columns():
+    """Raw site columns the scores are computed from"""
+    columns = []
+    for indicator in INDICATOR_RANGES:
+        for column in DERIVED_INDICATORS.get(indicator, (indicator,)):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def indicator_matrix(df):
+    """(n_sites, n_indicators) indicators normalized to 0-1 against INDICATOR_RANGES"""
+    values = np.empty((len(df), len(INDICATOR_RANGES)))
+    for i, (indicator, (worst, best)) in enumerate(INDICATOR_RANGES.items()):
+        if indicator in DERIVED_INDICATORS:
+            numerator, denominator = DERIVED_INDICATORS[indicator]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                raw = df[numerator].to_numpy(np.float64) / df[denominator].to_numpy(np.float64)
+        else:
+            raw = df[indicator].to_numpy(np.float64)
+        values[:, i] = (raw - worst) / (best - worst)
+    # Missing indicators count as the worst case
+    return np.clip(np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0), 0.0, 1.0)
+
+
+def weight_matrix(weights):
+    """(n_indicators, n_dimensions) weights, each dimension summing to 1"""
+    indicators = list(INDICATOR_RANGES)
+    matrix = np.zeros((len(indicators), len(weights)))
+    for j, dimension in enumerate(weights.values()):
+        for indicator, weight in dimension.items():
+            matrix[indicators.index(indicator), j] = weight
+    return matrix / matrix.sum(axis=0)
+
+
+_PESTEL_MATRIX = weight_matrix(PESTEL_WEIGHTS)
+_VRIO_MATRIX = weight_matrix(VRIO_WEIGHTS)
+
+
+def score_sites(df):
+    """PESTEL factors, VRIO dimensions and overall scores (0-10) for every row"""
+    indicators = indicator_matrix(df)
+    pestel = 10 * indicators @ _PESTEL_MATRIX
+    vrio = 10 * indicators @ _VRIO_MATRIX
+    scores = pd.DataFrame(np.hstack([pestel, vrio]), index=df.index,
+                          columns=[*PESTEL_WEIGHTS, *VRIO_WEIGHTS], dtype=np.float32)
+    scores['pestel_score'] = pestel.mean(axis=1).astype(np.float32)
+    scores['vrio_advantage'] = vrio.mean(axis=1).astype(np.float32)
+    return scores
+
+
+class ScoringEngine:
+    """score_sites memoized by (site, hash of its indicator row)
+
+    Cached scores live in flat arrays addressed through an index of site
+    keys, so a changed site is overwritten in place and new sites append.
+    """
+
+    def __init__(self, key='location'):
+        self.key = key
+        self.columns = [*PESTEL_WEIGHTS, *VRIO_WEIGHTS, *SCORE_COLUMNS]
+        self._lock = threading.Lock()
+        self.rescored = 0
+        self.clear()
+
+    def score(self, df):
+        """Scores aligned to df's rows; only new or changed sites are computed"""
+        keys = pd.Index(df[self.key].astype(str))
+        if not keys.is_unique:
+            return score_sites(df)
+
+        hashes = pd.util.hash_pandas_object(df[indicator_columns()], index=False).to_numpy()
+        with self._lock:
+            positions = self._index.get_indexer(keys)
+            known = positions >= 0
+            changed = ~known
+            changed[known] = self._hashes[positions[known]] != hashes[known]
+            self.rescored = int(changed.sum())
+
+            if self.rescored:
+                fresh = score_sites(df[changed]).to_numpy()
+                stale = known[changed]
+                self._values[positions[changed][stale]] = fresh[stale]
+                self._hashes[positions[changed][stale]] = hashes[changed][stale]
+
+                added = changed & ~known
+                if added.any():
+                    positions[added] = np.arange(len(self._index), len(self._index) + int(added.sum()))
+                    self._index = self._index.append(keys[added])
+                    self._hashes = np.concatenate([self._hashes, hashes[added]])
+                    self._values = np.vstack([self._values, fresh[~stale]])
+            values = self._values[positions]
+        return pd.DataFrame(values, index=df.index, columns=self.columns)
+
+    def clear(self):
+        with self._lock:
+            self._index = pd.Index([], dtype=object)
+            self._hashes = np.empty(0, dtype=np.uint64)
+            self._values = np.empty((0, len(self.columns)), dtype=np.float32)
@@ -0,0 +1,448 @@
+"""Sensor ingestion over UDP into memory-mapped ring buffers
+
+Site sensors (footfall counters, water meters, solar inverters, ...) send
+Graphite plaintext lines, "<metric> <value> [<epoch seconds>]", one or
+more per datagram. Samples are parsed a datagram at a time and appended to
+their metric's ring in one slice assignment per metric.
+
+Rings hold samples in time order, which `since` relies on for its binary
+search. UDP may reorder datagrams and senders may batch lines in any
+order, so each batch is sorted by timestamp before it is appended and
+samples older than the ring's newest are dropped and counted as late.
+
+Each metric is a fixed-size ring in its own file: a header (capacity,
+samples written) then timestamps and values, each stored twice, at slot i
+and i + capacity. The mirror keeps the newest n <= capacity samples in one
+contiguous slice, so readers get zero-copy views of the mapped file, and
+the file is the buffer, so a restart keeps the window. Every ring is a
+file of 32 x capacity bytes, so a store accepts at most `max_metrics` new
+metrics, optionally only names under given prefixes, and anything else
+sent is rejected rather than allocated.
+
+Record a synthetic capture, replay it and benchmark with:
+    python -m ecotourism.sensors capture sensors.txt --seconds 600
+    python -m ecotourism.sensors listen --port 2003 &
+    python -m ecotourism.sensors replay sensors.txt --port 2003 --speed 10
+    python -m ecotourism.sensors replay sensors.txt --port 2003 --reorder
+    python -m ecotourism.sensors benchmark --samples 1000000
+"""
+import argparse
+import operator
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from ecotourism.realtime import REALTIME_COLUMNS, realtime_frame_at
+
+SENSOR_CAPACITY = 86_400
+SENSOR_MAX_METRICS = 256
+SENSOR_SUFFIX = ".ring"
+_HEADER_BYTES = 16  # int64 capacity, int64 samples written
+_METRIC_NAME = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.\-]{0,127}\Z")
+
+
+class RingBuffer:
+    """One metric's mirrored ring of (timestamp, value) samples in a memory-mapped file
+
+    An existing file keeps the capacity it was created with. Views returned
+    by the readers are live: samples appended later overwrite the oldest
+    slots, so copy a window that must outlive further ingest.
+    """
+
+    def __init__(self, path, capacity=SENSOR_CAPACITY):
+        if not os.path.exists(path):
+            partial = f"{path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as f:
+                f.truncate(_HEADER_BYTES + 2 * 2 * capacity * 8)
+            np.memmap(partial, dtype=np.int64, mode="r+", shape=(2,))[:] = (capacity, 0)
+            os.replace(partial, path)
+        self.path = path
+        self._mapped_header = np.memmap(path, dtype=np.int64, mode="r+", shape=(2,))
+        self.capacity = int(self._mapped_header[0])
+        self._mapped = np.memmap(path, dtype=np.float64, mode="r+", offset=_HEADER_BYTES,
+                                 shape=(2, 2 * self.capacity))
+        # Plain ndarray views of the mapping: slicing a memmap object costs more than the copy
+        self._header = self._mapped_header.view(np.ndarray)
+        self._data = self._mapped.view(np.ndarray)
+
+    def __len__(self):
+        return min(int(self._header[1]), self.capacity)
+
+    @property
+    def written(self):
+        return int(self._header[1])
+
+    def newest(self):
+        """Timestamp of the newest sample, -inf when empty"""
+        written = self.written
+        return float(self._data[0, written % self.capacity + self.capacity - 1]) if written else -np.inf
+
+    def append(self, timestamps, values):
+        """Write samples after the newest, overwriting the oldest once full; returns samples kept
+
+        The batch is sorted by timestamp; samples older than the newest already
+        stored (or without a timestamp) are dropped so the ring stays in time order.
+        """
+        newest = self.newest()
+        samples = np.array((timestamps, values), dtype=np.float64)
+        # In-order batches, the common case, are checked on the input and skip the sort
+        if not (len(timestamps) and timestamps[0] >= newest and all(map(operator.le, timestamps[:-1], timestamps[1:]))):
+            samples = samples[:, np.argsort(samples[0], kind="stable")]
+            samples = samples[:, samples[0] >= newest]
+        written, n = self.written, samples.shape[1]
+        if n == 0:
+            return 0
+        if n > self.capacity:
+            samples = samples[:, -self.capacity:]
+        start = (written + n - samples.shape[1]) % self.capacity
+        head = min(samples.shape[1], self.capacity - start)
+        for mirror in (0, self.capacity):
+            self._data[:, start + mirror:start + mirror + head] = samples[:, :head]
+            if head < samples.shape[1]:
+                self._data[:, mirror:mirror + samples.shape[1] - head] = samples[:, head:]
+        # Publish after the data so a reader never sees unwritten slots
+        self._header[1] = written + n
+        return n
+
+    def latest(self, n=None):
+        """(timestamps, values) views of the newest n samples (default all), oldest first"""
+        n = len(self) if n is None else min(n, len(self))
+        end = self.written % self.capacity + self.capacity
+        return self._data[0, end - n:end], self._data[1, end - n:end]
+
+    def since(self, timestamp):
+        """Views of the samples at or after `timestamp` (append keeps the ring in time order)"""
+        timestamps, values = self.latest()
+        start = np.searchsorted(timestamps, timestamp)
+        return timestamps[start:], values[start:]
+
+    def flush(self):
+        self._mapped.flush()
+        self._mapped_header.flush()
+
+
+class SensorStore:
+    """Ring buffers keyed by metric name under one directory
+
+    New rings are only created while fewer than max_metrics exist, and,
+    if `prefixes` is given, for names starting with one of them.
+    """
+
+    def __init__(self, directory, capacity=SENSOR_CAPACITY, max_metrics=SENSOR_MAX_METRICS, prefixes=None):
+        self.directory = directory
+        self.capacity = capacity
+        self.max_metrics = max_metrics
+        self.prefixes = tuple(prefixes) if prefixes else None
+        self._rings = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(SENSOR_SUFFIX):
+                metric = name[:-len(SENSOR_SUFFIX)]
+                self._rings[metric] = RingBuffer(os.path.join(directory, name), capacity)
+
+    def ring(self, metric, create=True):
+        """The metric's ring, created on first write; None if absent and not creating
+
+        Rings another process created in the directory since are picked up too.
+        """
+        ring = self._rings.get(metric)
+        if ring is None:
+            if not _METRIC_NAME.match(metric):
+                raise ValueError(f"Invalid metric name: {metric!r}")
+            path = os.path.join(self.directory, metric + SENSOR_SUFFIX)
+            exists = os.path.exists(path)
+            if not create and not exists:
+                return None
+            if not exists and self.prefixes and not metric.startswith(self.prefixes):
+                raise ValueError(f"Metric outside the allowed prefixes: {metric!r}")
+            with self._lock:
+                ring = self._rings.get(metric)
+                if ring is None:
+                    if not exists and len(self._rings) >= self.max_metrics:
+                        raise ValueError(f"Metric limit of {self.max_metrics} reached: {metric!r}")
+                    ring = RingBuffer(path, self.capacity)
+                    self._rings[metric] = ring
+        return ring
+
+    def metrics(self):
+        return sorted(self._rings)
+
+    def append(self, metric, timestamps, values):
+        """Append to the metric's ring; returns samples kept (late ones are dropped)"""
+        return self.ring(metric).append(timestamps, values)
+
+    def since(self, metric, timestamp):
+        """Zero-copy (timestamps, values) of a metric from `timestamp` on; empty if unknown"""
+        ring = self.ring(metric, create=False) if _METRIC_NAME.match(metric) else None
+        if ring is None:
+            return np.empty(0), np.empty(0)
+        return ring.since(timestamp)
+
+    def flush(self):
+        for ring in list(self._rings.values()):
+            ring.flush()
+
+
+def parse_lines(data, now=None):
+    """({metric bytes: ([timestamps], [values])}, rejected lines) from Graphite plaintext"""
+    now = time.time() if now is None else now
+    batches, rejected = {}, 0
+    for line in data.split(b"\n"):
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            value = float(parts[1])
+            timestamp = float(parts[2]) if len(parts) > 2 else now
+        except (IndexError, ValueError):
+            rejected += 1
+            continue
+        batch = batches.get(parts[0])
+        if batch is None:
+            batch = batches[parts[0]] = ([], [])
+        batch[0].append(timestamp)
+        batch[1].append(value)
+    return batches, rejected
+
+
+class SensorListener:
+    """UDP endpoint feeding a SensorStore from a background thread"""
+
+    def __init__(self, store, host="127.0.0.1", port=2003, flush_seconds=5.0):
+        self.store = store
+        self.flush_seconds = flush_seconds
+        self.samples = self.rejected = self.late = self.datagrams = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.5)
+        self.address = self._socket.getsockname()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="sensor-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._socket.close()
+        self.store.flush()
+
+    def ingest(self, data):
+        """Store one datagram's samples; returns samples stored
+
+        Samples older than their metric's newest (a reordered or delayed
+        datagram) are counted in `late` rather than stored.
+        """
+        batches, rejected = parse_lines(data)
+        stored = late = 0
+        for metric, (timestamps, values) in batches.items():
+            try:
+                kept = self.store.append(metric.decode(), timestamps, values)
+            except (UnicodeDecodeError, ValueError):
+                rejected += len(timestamps)
+                continue
+            stored += kept
+            late += len(timestamps) - kept
+        self.samples += stored
+        self.rejected += rejected
+        self.late += late
+        self.datagrams += 1
+        return stored
+
+    def _serve(self):
+        flushed = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.ingest(self._socket.recv(65535))
+            except socket.timeout:
+                pass
+            if time.monotonic() - flushed > self.flush_seconds:
+                self.store.flush()
+                flushed = time.monotonic()
+
+
+def synthetic_capture(path, seconds=600, sites=20, end=None, seed=0):
+    """Write a Graphite plaintext capture: dashboard metrics plus per-site sensors each second"""
+    rng = np.random.default_rng(seed)
+    end = time.time() if end is None else end
+    timestamps = pd.to_datetime(np.arange(end - seconds, end), unit="s")
+    stamps = timestamps.astype(np.int64) / 1e9
+    frame = realtime_frame_at(timestamps, rng)
+    daylight = np.clip(np.sin((stamps % 86_400) / 86_400 * 2 * np.pi - np.pi / 2), 0, None)
+    columns = {column: frame[column].to_numpy() for column in REALTIME_COLUMNS}
+    for site in range(sites):
+        columns[f"site.{site:03d}.footfall"] = rng.poisson(5, seconds)
+        columns[f"site.{site:03d}.water_m3"] = rng.gamma(2.0, 0.01, seconds)
+        columns[f"site.{site:03d}.solar_kw"] = 40 * daylight * rng.uniform(0.7, 1.0, seconds)
+    with open(path, "w") as f:
+        for i, stamp in enumerate(stamps):
+            f.writelines(f"{metric} {values[i]:.6g} {stamp:.0f}\n" for metric, values in columns.items())
+    return seconds * len(columns)
+
+
+def replay(path, host="127.0.0.1", port=2003, speed=0.0, datagram_bytes=8192, shift=True, reorder=False, seed=0):
+    """Send a recorded capture over UDP; returns lines sent
+
+    speed 0 sends as fast as possible, otherwise at `speed` x the recorded
+    pace. With `shift`, timestamps move so the capture ends now (or, when
+    paced, starts now). `reorder` shuffles the lines inside each datagram
+    and swaps neighbouring datagrams, as a lossy network would, to check
+    that the listener keeps rings in time order and counts late samples.
+    """
+    with open(path, "rb") as f:
+        lines = [line.split() for line in f.read().splitlines() if line.strip()]
+    stamps = [float(parts[2]) if len(parts) > 2 else None for parts in lines]
+    known = [stamp for stamp in stamps if stamp is not None]
+    offset = 0.0
+    if shift and known:
+        offset = time.time() - (known[0] if speed else known[-1])
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rng = np.random.default_rng(seed)
+    held = []
+
+    def send(datagram):
+        if reorder:
+            datagram = [datagram[i] for i in rng.permutation(len(datagram))]
+            # Hold every other datagram back so it arrives after the next one
+            if not held:
+                held.append(datagram)
+                return
+            sender.sendto(b"".join(datagram), (host, port))
+            datagram = held.pop()
+        sender.sendto(b"".join(datagram), (host, port))
+
+    started, first = time.monotonic(), known[0] if known else 0.0
+    datagram, size = [], 0
+    for parts, stamp in zip(lines, stamps):
+        if stamp is not None and speed:
+            delay = (stamp - first) / speed - (time.monotonic() - started)
+            if delay > 0.001:
+                if datagram:
+                    send(datagram)
+                    datagram, size = [], 0
+                time.sleep(delay)
+        line = b" ".join(parts[:2] + ([b"%.3f" % (stamp + offset)] if stamp is not None else [])) + b"\n"
+        if size + len(line) > datagram_bytes:
+            send(datagram)
+            datagram, size = [], 0
+        datagram.append(line)
+        size += len(line)
+    if datagram:
+        send(datagram)
+    if held:
+        sender.sendto(b"".join(held[0]), (host, port))
+    sender.close()
+    return len(lines)
+
+
+def _send_paced(address, datagrams, per_second):
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    started = time.monotonic()
+    for i, datagram in enumerate(datagrams):
+        delay = i / per_second - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+        sender.sendto(datagram, address)
+
+
+def _benchmark(samples, metrics, rate):
+    with tempfile.TemporaryDirectory() as directory:
+        store = SensorStore(directory, capacity=samples)
+        names = [f"site.{i:03d}.footfall".encode() for i in range(metrics)]
+        now = time.time()
+
+        def datagrams_from(base):
+            return [b"".join(b"%s %d %.3f\n" % (names[i % metrics], i % 97, base + i / samples)
+                             for i in range(start, min(start + 200, samples)))
+                    for start in range(0, samples, 200)]
+
+        datagrams = datagrams_from(now)
+        listener = SensorListener(store, port=0)
+
+        begin = time.perf_counter()
+        for datagram in datagrams:
+            listener.ingest(datagram)
+        seconds = time.perf_counter() - begin
+        print(f"Parse + ring append: {samples:,} samples in {seconds:.2f}s ({samples / seconds:,.0f} samples/s)")
+
+        import multiprocessing
+
+        # Newer timestamps than the first pass, or every sample would be late
+        listener.samples = 0
+        listener.start()
+        sender = multiprocessing.Process(target=_send_paced,
+                                         args=(listener.address, datagrams_from(now + 1), rate / 200))
+        begin = time.perf_counter()
+        sender.start()
+        sender.join()
+        time.sleep(0.5)
+        seconds = time.perf_counter() - begin - 0.5
+        listener.stop()
+        print(f"UDP at {rate:,} samples/s from a second process: {listener.samples:,} of {samples:,} "
+              f"stored in {seconds:.2f}s ({listener.samples / samples:.2%}), {listener.late:,} late")
+
+        begin = time.perf_counter()
+        for _ in range(1000):
+            store.since(names[0].decode(), now)
+        print(f"Window read (zero-copy view): {(time.perf_counter() - begin) * 1000:.2f} us")
+
+        # Reopen to show the window survives a restart
+        reopened = SensorStore(directory, capacity=samples)
+        print(f"After reopen: {len(reopened.ring(names[0].decode()))} samples in {names[0].decode()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    capture = commands.add_parser("capture", help="write a synthetic capture file")
+    capture.add_argument("path")
+    capture.add_argument("--seconds", type=int, default=600)
+    capture.add_argument("--sites", type=int, default=20)
+    listen = commands.add_parser("listen", help="run the UDP listener in the foreground")
+    listen.add_argument("--host", default="127.0.0.1")
+    listen.add_argument("--port", type=int, default=2003)
+    listen.add_argument("--store", default=os.path.join(".cache", "sensors"))
+    listen.add_argument("--max-metrics", type=int, default=SENSOR_MAX_METRICS)
+    listen.add_argument("--prefix", action="append", help="accept only metrics under this prefix (repeatable)")
+    send = commands.add_parser("replay", help="send a capture to a listener")
+    send.add_argument("path")
+    send.add_argument("--host", default="127.0.0.1")
+    send.add_argument("--port", type=int, default=2003)
+    send.add_argument("--speed", type=float, default=0.0, help="x recorded pace; 0 = as fast as possible")
+    send.add_argument("--reorder", action="store_true",
+                      help="shuffle lines within datagrams and swap neighbouring datagrams")
+    bench = commands.add_parser("benchmark", help="time parsing, ring appends and UDP ingest")
+    bench.add_argument("--samples", type=int, default=1_000_000)
+    bench.add_argument("--metrics", type=int, default=100)
+    bench.add_argument("--rate", type=int, default=50_000, help="samples per second sent over UDP")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        print(f"Wrote {synthetic_capture(args.path, args.seconds, args.sites):,} samples to {args.path}")
+    elif args.command == "listen":
+        listener = SensorListener(SensorStore(args.store, max_metrics=args.max_metrics, prefixes=args.prefix),
+                                  args.host, args.port).start()
+        print(f"Listening on udp://{listener.address[0]}:{listener.address[1]}, storing in {args.store}")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"{listener.samples:,} samples, {listener.rejected:,} rejected, {listener.late:,} late")
+        except KeyboardInterrupt:
+            listener.stop()
+    elif args.command == "replay":
+        start = time.perf_counter()
+        sent = replay(args.path, args.host, args.port, args.speed, reorder=args.reorder)
+        print(f"Sent {sent:,} lines in {time.perf_counter() - start:.2f}s")
+    else:
+        _benchmark(args.samples, args.metrics, args.rate)
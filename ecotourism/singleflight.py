@@ -0,0 +1,117 @@
+"""Process-wide request coalescing for model calls
+
+Concurrent identical requests (same cache key) share one in-flight call:
+the first caller starts it on a bounded worker pool and everyone, including
+late joiners, reads the same chunks as they arrive. Distinct requests wait
+for a queue slot, so when workers are stalled on the provider's rate limit
+new work backs up here instead of piling onto the provider.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackpressureError(RuntimeError):
+    """The request queue stayed full for the whole admission timeout"""
+
+
+class _Flight:
+    """Chunks of one in-flight call, readable by any number of subscribers"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def put(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done, self.error = True, error
+            self.condition.notify_all()
+
+    def __iter__(self):
+        position = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: position < len(self.chunks) or self.done)
+                chunks, done, error = self.chunks[position:], self.done, self.error
+            position += len(chunks)
+            yield from chunks
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """One call per key at a time, at most max_in_flight running and max_queued waiting"""
+
+    def __init__(self, max_in_flight=8, max_queued=32, admission_timeout=10.0):
+        self.admission_timeout = admission_timeout
+        self._executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix="singleflight")
+        self._slots = threading.BoundedSemaphore(max_in_flight + max_queued)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.joined = 0
+        self.rejected = 0
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.joined += 1
+            return flight
+
+    def stream(self, key, produce):
+        """Iterator over the chunks of produce() (an iterable), shared per key"""
+        flight = self._join(key)
+        if flight is not None:
+            return iter(flight)
+
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            # An identical call may have started while we waited
+            flight = self._join(key)
+            if flight is not None:
+                return iter(flight)
+            with self._lock:
+                self.rejected += 1
+            raise BackpressureError("Too many requests in flight, try again shortly")
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.joined += 1
+                self._slots.release()
+                return iter(flight)
+            flight = self._flights[key] = _Flight()
+            self.started += 1
+        self._executor.submit(self._run, key, flight, produce)
+        return iter(flight)
+
+    def _run(self, key, flight, produce):
+        error = None
+        try:
+            for chunk in produce():
+                flight.put(chunk)
+        except Exception as e:
+            error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            self._slots.release()
+            flight.finish(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "started": self.started,
+                "joined": self.joined,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,173 @@
+"""Seeded, vectorized synthetic site-month generator for load and benchmark tests
+
+Write a dataset straight to Parquet with:
+    python -m ecotourism.synthetic sites.parquet --sites 100000 --months 100
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+SITE_TYPES = np.array(['Cultural', 'Wildlife', 'Marine', 'Adventure', 'Natural'])
+SITE_TYPE_WEIGHTS = np.array([0.3, 0.15, 0.2, 0.15, 0.2])
+# Average spend per visitor (USD) by site type
+SITE_TYPE_SPEND = np.array([22.0, 31.0, 35.0, 27.0, 18.0])
+
+# Indonesian archipelago bounding box
+LATITUDE_RANGE = (-11.0, 6.0)
+LONGITUDE_RANGE = (95.0, 141.0)
+
+HISTORY_COLUMNS = [
+    'month', 'site_id', 'location', 'type', 'latitude', 'longitude',
+    'monthly_visitors', 'sustainability_score', 'satisfaction_score', 'carbon_footprint',
+    'monthly_revenue', 'education_programs', 'pestel_score', 'vrio_advantage',
+    'community_impact', 'innovation_index'
+]
+
+
+def _site_attributes(rng, site_ids):
+    """Static per-site attributes for a block of site ids"""
+    n = len(site_ids)
+    type_codes = rng.choice(len(SITE_TYPES), size=n, p=SITE_TYPE_WEIGHTS)
+    sustainability = np.clip(rng.normal(8.4, 0.7, n), 5.0, 10.0)
+    return {
+        'site_id': site_ids.astype(np.int32),
+        'type_code': type_codes,
+        'latitude': rng.uniform(*LATITUDE_RANGE, n),
+        'longitude': rng.uniform(*LONGITUDE_RANGE, n),
+        'base_visitors': rng.lognormal(np.log(20000), 0.6, n),
+        'growth': rng.normal(0.004, 0.003, n),  # monthly trend
+        'season_amplitude': rng.uniform(0.1, 0.45, n),
+        'season_phase': rng.uniform(-1.0, 1.0, n),  # months around the July peak
+        'spend': SITE_TYPE_SPEND[type_codes] * rng.lognormal(0.0, 0.2, n),
+        'sustainability': sustainability,
+        # Greener sites emit less per visitor
+        'carbon': np.clip(2.6 - 0.22 * sustainability + rng.normal(0, 0.15, n), 0.1, 2.5),
+        'community': np.clip(0.6 * sustainability + rng.normal(3.6, 0.4, n), 5.0, 10.0),
+        'education': rng.integers(2, 30, n),
+        'innovation': rng.integers(55, 99, n),
+        'pestel': np.clip(rng.normal(8.3, 0.5, n), 5.0, 10.0),
+        'vrio': np.clip(0.5 * sustainability + rng.normal(4.5, 0.5, n), 5.0, 10.0)
+    }
+
+
+def _history_block(rng, sites, months):
+    """Site x month rows for one block of sites, all computed as whole arrays"""
+    n_sites, n_months = len(sites['site_id']), len(months)
+    t = np.arange(n_months)
+    calendar_month = months.month.to_numpy()
+
+    # Seasonality: broad mid-year peak plus a December holiday bump
+    season = 1 + sites['season_amplitude'][:, None] * (
+        np.cos(2 * np.pi * (calendar_month[None, :] - 7 - sites['season_phase'][:, None]) / 12)
+        + 0.5 * (calendar_month[None, :] == 12)
+    )
+    trend = np.exp(sites['growth'][:, None] * t[None, :])
+    noise = rng.lognormal(0.0, 0.08, (n_sites, n_months))
+    visitors = np.maximum(sites['base_visitors'][:, None] * season * trend * noise, 0).round()
+
+    # Revenue is driven by visitors; satisfaction dips when crowded
+    revenue = visitors * sites['spend'][:, None] * rng.lognormal(0.0, 0.05, (n_sites, n_months))
+    crowding = visitors / sites['base_visitors'][:, None] - 1
+    satisfaction = np.clip(
+        5.2 + 0.45 * sites['sustainability'][:, None] - 0.8 * crowding
+        + rng.normal(0, 0.15, (n_sites, n_months)), 1.0, 10.0
+    )
+    sustainability = np.clip(
+        sites['sustainability'][:, None] + rng.normal(0, 0.05, (n_sites, n_months)), 1.0, 10.0
+    )
+
+    def per_site(values, dtype):
+        return np.repeat(values.astype(dtype), n_months)
+
+    location_codes = np.repeat(np.arange(n_sites), n_months)
+    locations = pd.Categorical.from_codes(
+        location_codes, [f"Eco Site {i:07d}" for i in sites['site_id']]
+    )
+    return pd.DataFrame({
+        'month': np.tile(months.to_numpy(), n_sites),
+        'site_id': per_site(sites['site_id'], np.int32),
+        'location': locations,
+        'type': pd.Categorical.from_codes(np.repeat(sites['type_code'], n_months), SITE_TYPES),
+        'latitude': per_site(sites['latitude'], np.float64),
+        'longitude': per_site(sites['longitude'], np.float64),
+        'monthly_visitors': visitors.ravel().astype(np.int64),
+        'sustainability_score': sustainability.ravel().astype(np.float32),
+        'satisfaction_score': satisfaction.ravel().astype(np.float32),
+        'carbon_footprint': per_site(sites['carbon'], np.float32),
+        'monthly_revenue': revenue.ravel().astype(np.int64),
+        'education_programs': per_site(sites['education'], np.int32),
+        'pestel_score': per_site(sites['pestel'], np.float32),
+        'vrio_advantage': per_site(sites['vrio'], np.float32),
+        'community_impact': per_site(sites['community'], np.float32),
+        'innovation_index': per_site(sites['innovation'], np.int32)
+    }, columns=HISTORY_COLUMNS)
+
+
+def iter_synthetic_history(n_sites, n_months=24, seed=0, chunk_rows=1_000_000, end_month=None):
+    """Yield site x month DataFrames of at most ~chunk_rows rows
+
+    Chunks cover disjoint blocks of sites, and each block draws from its own
+    generator seeded by (seed, block), so output is reproducible.
+    """
+    end_month = pd.Timestamp.now().to_period("M") if end_month is None else pd.Period(end_month, "M")
+    months = pd.period_range(end=end_month, periods=n_months, freq="M").to_timestamp()
+    sites_per_chunk = max(1, chunk_rows // n_months)
+
+    for block, start in enumerate(range(0, n_sites, sites_per_chunk)):
+        rng = np.random.default_rng([seed, block])
+        site_ids = np.arange(start, min(start + sites_per_chunk, n_sites))
+        yield _history_block(rng, _site_attributes(rng, site_ids), months)
+
+
+def generate_synthetic_history(n_sites, n_months=24, seed=0, end_month=None):
+    """Whole synthetic history in memory (small datasets only)"""
+    return pd.concat(list(iter_synthetic_history(n_sites, n_months, seed, end_month=end_month)),
+                     ignore_index=True)
+
+
+def generate_synthetic_snapshot(n_sites, seed=0):
+    """Latest month per site, in the site schema used by the dashboards"""
+    history = generate_synthetic_history(n_sites, 1, seed)
+    return history.drop(columns=['month', 'site_id'])
+
+
+def write_synthetic_parquet(path, n_sites, n_months=24, seed=0, chunk_rows=1_000_000, end_month=None):
+    """Stream the synthetic history into one Parquet file; returns rows written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in iter_synthetic_history(n_sites, n_months, seed, chunk_rows, end_month):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                # Fix dictionary index width so every chunk shares one schema
+                schema = pa.schema([
+                    field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                    if pa.types.is_dictionary(field.type) else field
+                    for field in table.schema
+                ]).remove_metadata()
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            writer.write_table(table.cast(schema), row_group_size=chunk_rows)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--sites", type=int, default=10_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = write_synthetic_parquet(args.path, args.sites, args.months, args.seed, args.chunk_rows)
+    print(f"Wrote {rows:,} rows to {args.path} in {time.perf_counter() - start:.1f}s")
@@ -9,8 +9,36 @@ from datetime import datetime, timedelta
 import json
 import os
 import base64
+import uuid
 from io import BytesIO
 
+from ecotourism.ai_client import (
+    DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT,
+    build_messages, stream_chat_completion
+)
+from ecotourism.anomaly import AnomalyDetector, AnomalyMonitor
+from ecotourism.batch import RateLimiter, read_batch_csv, results_frame, results_to_jsonl, run_batch
+from ecotourism.capacity import compare_scenarios
+from ecotourism.carbon import CarbonLedger, synthetic_activity
+from ecotourism.chat_store import ChatStore, extractive_summary, format_transcript
+from ecotourism.correlation import StreamingCovariance, cached_correlation_report
+from ecotourism.data_sources import apply_filters, get_data_source
+from ecotourism.downsample import (
+    MAX_POINTS_PER_TRACE, SCATTER_DENSITY_THRESHOLD, density_grid, downsample_series, downsample_xy
+)
+from ecotourism.forecasting import VisitorForecaster, aggregate_forecast, visitor_matrix
+from ecotourism.geo import GridIndex, zoom_for_radius
+from ecotourism.image_cache import ImageCache, content_hash
+from ecotourism.intent import default_router
+from ecotourism.path_model import PATH_VARIABLES, fit_path_model, format_path_analysis
+from ecotourism.phash import FINGERPRINT_BITS
+from ecotourism.realtime import REALTIME_COLUMNS, RealtimeFeed
+from ecotourism.response_cache import ResponseCache, make_cache_key
+from ecotourism.retrieval import KnowledgeIndex, format_passages
+from ecotourism.scoring import PESTEL_WEIGHTS, SCORE_COLUMNS, VRIO_WEIGHTS, ScoringEngine, indicator_columns
+from ecotourism.sensors import SENSOR_CAPACITY, SENSOR_MAX_METRICS, SensorListener, SensorStore
+from ecotourism.singleflight import SingleFlight
+
 # Page config
 st.set_page_config(
     page_title="🌱 GREEN SMART ECOTOURISM AI",
@@ -117,60 +145,245 @@ st.markdown("""
 # Enhanced config with hidden API integration
 def get_config():
     """Get configuration with auto-activation"""
+    config = {
+        "api_key": None,
+        "model": "qwen/qwq-32b:free",
+        "base_url": "https://openrouter.ai/api/v1",
+        "connect_timeout": DEFAULT_CONNECT_TIMEOUT,
+        "read_timeout": DEFAULT_READ_TIMEOUT
+    }
+    
     try:
         if hasattr(st, 'secrets') and 'api' in st.secrets:
-            api_key = st.secrets["api"]["openrouter_api_key"]
+            api = st.secrets["api"]
+            api_key = api.get("openrouter_api_key")
             if api_key and api_key != "your-api-key-here":
-                return {
-                    "api_key": api_key,
-                    "model": "qwen/qwq-32b:free",
-                    "base_url": "https://openrouter.ai/api/v1",
-                    "active": True
-                }
+                config["api_key"] = api_key
+            config["model"] = api.get("openrouter_model", config["model"])
+            config["base_url"] = api.get("openrouter_base_url", config["base_url"])
+            config["connect_timeout"] = float(api.get("connect_timeout", config["connect_timeout"]))
+            config["read_timeout"] = float(api.get("read_timeout", config["read_timeout"]))
     except Exception:
         pass
     
-    # Auto-generate working API config (demo purposes)
-    return {
-        "api_key": os.getenv("OPENROUTER_API_KEY") or "demo-key-active",
-        "model": "qwen/qwq-32b:free",
-        "base_url": "https://openrouter.ai/api/v1",
-        "active": True
-    }
+    # Environment overrides (e.g. pointing at a local stand-in server)
+    config["api_key"] = config["api_key"] or os.getenv("OPENROUTER_API_KEY")
+    config["model"] = os.getenv("OPENROUTER_MODEL", config["model"])
+    config["base_url"] = os.getenv("OPENROUTER_BASE_URL", config["base_url"])
+    config["connect_timeout"] = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", config["connect_timeout"]))
+    config["read_timeout"] = float(os.getenv("OPENROUTER_READ_TIMEOUT", config["read_timeout"]))
+    
+    # Without a key every request would be rejected, so serve demo responses
+    config["active"] = bool(config["api_key"])
+    return config
 
-# Advanced AI response system with real-time enhancement
-def get_enhanced_ai_response(query, analysis_type="general"):
-    """Enhanced AI response with context-aware analysis"""
+@st.cache_resource
+def get_response_cache():
+    """Process-wide response cache shared by all sessions"""
+    return ResponseCache(
+        os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite3")),
+        max_memory_entries=int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", 256)),
+        max_disk_entries=int(os.getenv("RESPONSE_CACHE_DISK_ENTRIES", 5000)),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600))
+    )
+
+@st.cache_resource
+def get_rate_limiter(base_url):
+    """Token bucket shared by every session calling the same provider"""
+    return RateLimiter(float(os.getenv("AI_RATE_LIMIT", 5)), float(os.getenv("AI_RATE_BURST", 10)))
+
+@st.cache_resource
+def get_flight_group():
+    """Process-wide coalescing of identical in-flight model calls"""
+    return SingleFlight(int(os.getenv("AI_MAX_IN_FLIGHT", 8)), int(os.getenv("AI_MAX_QUEUED", 32)))
+
+@st.cache_resource
+def get_knowledge_index():
+    """Process-wide BM25 index over our sustainability documents"""
+    return KnowledgeIndex(os.getenv("KNOWLEDGE_INDEX_DIR", os.path.join(".cache", "knowledge_index")))
+
+KNOWLEDGE_DIR = os.getenv("KNOWLEDGE_DIR", "knowledge")
+KNOWLEDGE_PASSAGES = int(os.getenv("KNOWLEDGE_PASSAGES", 4))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def refresh_knowledge_index():
+    """Index new or changed documents at most once a minute; returns index stats"""
+    index = get_knowledge_index()
+    index.update(KNOWLEDGE_DIR)
+    return index.stats()
+
+def retrieve_passages(query):
+    """Top knowledge-base passages for a query, [] if there are none"""
+    try:
+        refresh_knowledge_index()
+        return get_knowledge_index().search(query, KNOWLEDGE_PASSAGES)
+    except (OSError, ValueError):
+        return []
+
+class Annotation(str):
+    """Display-only text in a response stream, left out of stored chat history"""
+
+def knowledge_footer(passages):
+    """Sources section appended to demo responses"""
+    return Annotation("\n\n📚 **From the knowledge base:**\n\n" + format_passages(passages, max_chars=300))
+
+@st.cache_resource
+def get_intent_router():
+    """Query router for 'general' requests, over the vocabulary in INTENT_VOCABULARY if set"""
+    return default_router(os.getenv("INTENT_VOCABULARY"))
+
+@st.cache_resource
+def get_chat_store():
+    """Process-wide chat history, one conversation per browser session"""
+    return ChatStore(os.getenv("CHAT_HISTORY_PATH", os.path.join(".cache", "chat.sqlite3")))
+
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", 3000))
+CHAT_DISPLAY_MESSAGES = 50
+CHAT_RETENTION_HOURS = float(os.getenv("CHAT_RETENTION_HOURS", 24))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", 1000))
+
+@st.cache_data(ttl=600, show_spinner=False)
+def prune_chat_history():
+    """Drop idle or excess conversations at most every ten minutes; returns how many"""
+    return get_chat_store().prune(CHAT_RETENTION_HOURS * 3600, CHAT_MAX_SESSIONS)
+
+def chat_session_id():
+    """Conversation id of this browser session, held server-side only so links never carry it
+
+    A reload starts a new conversation; the old one is pruned once idle.
+    """
+    if 'chat_session' not in st.session_state:
+        st.session_state.chat_session = uuid.uuid4().hex
+    return st.session_state.chat_session
+
+def summarize_turns(summary, turns):
+    """Fold chat turns into the running summary with the model, or extractively in demo mode"""
     config = get_config()
+    if config["active"]:
+        transcript = format_transcript(summary, turns)
+        messages = build_messages("Update the conversation summary with the new turns. Keep sites, figures, "
+                                  "decisions and open questions; answer with the summary only, under 250 words.",
+                                  transcript)
+        try:
+            return "".join(request_ai_response(ai_services(), messages,
+                                               make_cache_key(transcript, "summary", config["model"])))
+        except Exception:
+            pass
+    return extractive_summary(summary, turns)
+
+def ai_services():
+    """Config and the process-wide objects a model call uses, resolved on the script thread
+
+    Worker threads have no ScriptRunContext, so they are handed these rather
+    than calling the st.cache_* getters themselves.
+    """
+    config = get_config()
+    return {'config': config, 'router': get_intent_router(), 'cache': get_response_cache(),
+            'limiter': get_rate_limiter(config["base_url"]), 'flights': get_flight_group()}
+
+def enhancement_marker():
+    """Timestamped footer appended to model responses"""
+    return Annotation(f"\n\n*🔄 Enhanced with real-time market data • {datetime.now().strftime('%H:%M:%S')}*")
+
+# Advanced AI response system with real-time enhancement
+def get_enhanced_ai_response(query, analysis_type="general", stream=False, fallback=True, history=None,
+                             services=None, passages=None):
+    """Enhanced AI response with context-aware analysis
+    
+    A "general" query is first routed to the framework it is asking about.
+    With stream=True a generator of text chunks is returned for st.write_stream.
+    With fallback=False model errors are raised instead of answered with the
+    contextual response (batch runs record them per row).
+    history is earlier conversation (ChatStore.context) sent before the query.
+    services (ai_services) and passages are resolved here unless given, as
+    they must be for calls off the script thread.
+    """
+    services = services or ai_services()
+    config = services["config"]
+    if analysis_type == "general":
+        analysis_type, _ = services["router"].route(query)
+    if passages is None:
+        passages = retrieve_passages(query)
     
     if config["active"]:
+        context_prompts = {
+            "pestel": "Analyze this tourism query using PESTEL framework (Political, Economic, Social, Technological, Environmental, Legal factors)",
+            "vrio": "Evaluate using VRIO framework (Value, Rarity, Imitability, Organization) for sustainable competitive advantage",
+            "multimodal": "Provide comprehensive multimodal analysis including visual, textual, and data-driven insights",
+            "intra_variable": "Conduct intra-variable direct effect analysis showing relationships between key variables",
+            "strategy": "Develop a green marketing strategy for this sustainable tourism business with measurable targets"
+        }
+        
+        system_prompt = context_prompts.get(analysis_type, "You are an advanced sustainable tourism AI expert with real-time market insights.")
+        context = format_passages(passages)
+        if context:
+            system_prompt += ("\n\nGround your answer in these passages from our knowledge base "
+                              "and cite them by number where used:\n\n" + context)
+        messages = build_messages(system_prompt, query, history or ())
+        
+        # Identical questions from any session are served from the cache; the key
+        # covers passages and conversation so neither is answered stale
+        cache = services["cache"]
+        if history:
+            context += json.dumps(history, ensure_ascii=False)
+        cache_key = make_cache_key(query, analysis_type, config["model"], context)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return iter([cached, enhancement_marker()]) if stream else cached + enhancement_marker()
+        
+        if stream:
+            return stream_enhanced_ai_response(services, messages, query, analysis_type, cache_key)
+        
         try:
-            # Simulate enhanced AI processing with real-time data integration
-            context_prompts = {
-                "pestel": "Analyze this tourism query using PESTEL framework (Political, Economic, Social, Technological, Environmental, Legal factors)",
-                "vrio": "Evaluate using VRIO framework (Value, Rarity, Imitability, Organization) for sustainable competitive advantage",
-                "multimodal": "Provide comprehensive multimodal analysis including visual, textual, and data-driven insights",
-                "intra_variable": "Conduct intra-variable direct effect analysis showing relationships between key variables"
-            }
-            
-            system_prompt = context_prompts.get(analysis_type, "You are an advanced sustainable tourism AI expert with real-time market insights.")
-            
-            # Enhanced response generation (simulated for demo)
-            response = generate_contextual_response(query, analysis_type)
+            response = "".join(request_ai_response(services, messages, cache_key))
             
             # Add real-time enhancement marker
-            response += f"\n\n*🔄 Enhanced with real-time market data • {datetime.now().strftime('%H:%M:%S')}*"
-            return response
+            return response + enhancement_marker()
             
         except Exception as e:
+            if not fallback:
+                raise
             st.warning(f"AI enhancement unavailable: {str(e)[:50]}...")
     
-    return generate_contextual_response(query, analysis_type)
+    response = generate_contextual_response(query, analysis_type, services.get("path_model"))
+    footer = knowledge_footer(passages) if passages else ""
+    return iter([response, footer]) if stream else response + footer
 
-def generate_contextual_response(query, analysis_type):
-    """Generate context-aware responses based on analysis type"""
-    query_lower = query.lower()
+def request_ai_response(services, messages, cache_key):
+    """Model tokens, shared with every identical request already in flight"""
+    config, limiter, cache = services["config"], services["limiter"], services["cache"]
     
+    def produce():
+        # Waiting on the rate limit holds a queue slot, so bursts back up in the flight group
+        limiter.acquire()
+        tokens = []
+        for token in stream_chat_completion(config, messages):
+            tokens.append(token)
+            yield token
+        # Only complete responses are cached
+        cache.set(cache_key, "".join(tokens))
+    
+    return services["flights"].stream(cache_key, produce)
+
+def stream_enhanced_ai_response(services, messages, query, analysis_type, cache_key):
+    """Stream tokens from the model, falling back to the contextual response"""
+    tokens = []
+    try:
+        for token in request_ai_response(services, messages, cache_key):
+            tokens.append(token)
+            yield token
+    except Exception as e:
+        if tokens:
+            yield Annotation(f"\n\n*⚠️ Stream interrupted: {str(e)[:50]}...*")
+            return
+        yield Annotation(f"*⚠️ AI enhancement unavailable: {str(e)[:50]}...*\n\n")
+        yield generate_contextual_response(query, analysis_type, services.get("path_model"))
+        return
+    
+    yield enhancement_marker()
+
+def generate_contextual_response(query, analysis_type, path_model=None):
+    """Generate context-aware responses based on analysis type (path_model: a fit_site_path_model result)"""
     if analysis_type == "pestel":
         return generate_pestel_analysis(query)
     elif analysis_type == "vrio":
@@ -178,10 +391,10 @@ def generate_contextual_response(query, analysis_type):
     elif analysis_type == "multimodal":
         return generate_multimodal_analysis(query)
     elif analysis_type == "intra_variable":
-        return generate_intra_variable_analysis(query)
+        return generate_intra_variable_analysis(query, path_model)
     
     # Default enhanced response
-    if any(word in query_lower for word in ['strategy', 'marketing', 'promotion']):
+    if analysis_type == "strategy":
         return f"""🎯 **ADVANCED GREEN MARKETING STRATEGY**
 
 **Real-Time Market Intelligence:**
@@ -367,172 +580,338 @@ def generate_multimodal_analysis(query):
 - **Decision Support:** 97% accuracy improvement
 - **User Experience:** 89% engagement increase"""
 
-def generate_intra_variable_analysis(query):
+@st.cache_data(show_spinner=False)
+def fit_site_path_model(n_resamples=1000):
+    """Path model fitted to the site history, cached per dataset"""
+    history = generate_site_history(tuple(PATH_VARIABLES))
+    return fit_path_model(history, n_resamples=n_resamples), history.mean().to_dict()
+
+def generate_intra_variable_analysis(query, path_model=None):
     """Generate intra-variable direct effect analysis"""
-    return f"""📈 **INTRA-VARIABLE DIRECT EFFECT ANALYSIS**
-
-**🔗 VARIABLE RELATIONSHIP MATRIX**
-
-**Primary Variables:**
-- **Sustainability Score (X₁):** 9.2/10
-- **Visitor Satisfaction (X₂):** 8.9/10  
-- **Revenue Performance (X₃):** +134%
-- **Environmental Impact (X₄):** -45% carbon
-- **Community Benefit (X₅):** +89% engagement
-
-**DIRECT EFFECT COEFFICIENTS:**
-
-**X₁ → X₂ (Sustainability → Satisfaction)**
-- **Coefficient:** β₁₂ = +0.73 (p < 0.001)
-- **Effect Size:** Large (Cohen's d = 1.24)
-- **Interpretation:** 1% sustainability increase = 0.73% satisfaction gain
-- **Confidence Interval:** [0.68, 0.78] at 95%
-
-**X₁ → X₃ (Sustainability → Revenue)**
-- **Coefficient:** β₁₃ = +0.89 (p < 0.001)
-- **Effect Size:** Very Large (Cohen's d = 1.67)
-- **Interpretation:** 1% sustainability increase = 0.89% revenue boost
-- **Premium Pricing:** +23% willingness to pay
-
-**X₂ → X₃ (Satisfaction → Revenue)**
-- **Coefficient:** β₂₃ = +0.56 (p < 0.01)
-- **Effect Size:** Medium (Cohen's d = 0.84)
-- **Interpretation:** 1% satisfaction increase = 0.56% revenue growth
-- **Retention Rate:** +45% repeat visitors
-
-**X₄ → X₁ (Environmental → Sustainability)**
-- **Coefficient:** β₄₁ = -0.92 (p < 0.001)
-- **Effect Size:** Very Large (Cohen's d = 1.89)
-- **Interpretation:** 1% environmental improvement = 0.92% sustainability gain
-- **Carbon Efficiency:** Primary driver identified
-
-**X₅ → X₂ (Community → Satisfaction)**
-- **Coefficient:** β₅₂ = +0.67 (p < 0.001)
-- **Effect Size:** Large (Cohen's d = 1.12)
-- **Interpretation:** 1% community engagement = 0.67% satisfaction increase
-- **Authenticity Factor:** Key differentiator
-
-**MEDIATION ANALYSIS:**
-- **X₁ → X₂ → X₃:** Indirect effect = 0.41 (significant)
-- **X₄ → X₁ → X₃:** Indirect effect = 0.82 (highly significant)
-- **Total Variance Explained:** R² = 0.87 (87% prediction accuracy)
-
-**OPTIMIZATION RECOMMENDATIONS:**
-1. **Priority:** Enhance environmental performance (highest ROI)
-2. **Strategy:** Strengthen community partnerships (+67% multiplier)
-3. **Investment:** Focus on sustainability infrastructure (4.7:1 return)
-4. **Monitoring:** Real-time variable tracking system"""
+    result, means = path_model or fit_site_path_model()
+    return format_path_analysis(result, means)
+
+def get_data_config(section="data", env_prefix="TOURISM_DATA", defaults=None):
+    """Data source spec from a secrets section or environment"""
+    spec = dict(defaults or {"source": "synthetic"})
+    try:
+        if hasattr(st, 'secrets') and section in st.secrets:
+            spec.update(st.secrets[section])
+    except Exception:
+        pass
+    
+    spec["source"] = os.getenv(f"{env_prefix}_SOURCE", spec["source"])
+    for key in ("path", "table", "sites", "months"):
+        if os.getenv(f"{env_prefix}_{key.upper()}"):
+            spec[key] = os.getenv(f"{env_prefix}_{key.upper()}")
+    return spec
+
+@st.cache_resource
+def get_scoring_engine():
+    """Process-wide PESTEL/VRIO scorer, memoized per site"""
+    return ScoringEngine()
 
 # Enhanced data generation with realistic patterns
 @st.cache_data
-def generate_enhanced_tourism_data():
-    """Generate realistic tourism data with advanced metrics"""
-    locations = [
-        {"name": "Borobudur Heritage Complex", "type": "Cultural", "lat": -7.6079, "lon": 110.2038},
-        {"name": "Komodo National Park", "type": "Wildlife", "lat": -8.5451, "lon": 119.6945},
-        {"name": "Raja Ampat Marine Reserve", "type": "Marine", "lat": -0.2299, "lon": 130.5226},
-        {"name": "Ubud Cultural Valley", "type": "Cultural", "lat": -8.5069, "lon": 115.2625},
-        {"name": "Mount Bromo Volcanic Park", "type": "Adventure", "lat": -7.9425, "lon": 112.9530},
-        {"name": "Lake Toba Caldera", "type": "Natural", "lat": 2.6816, "lon": 98.8905}
-    ]
+def generate_enhanced_tourism_data(columns=None, filters=None):
+    """Load site metrics from the configured data source
     
-    data = []
-    for loc in locations:
-        base_visitors = random.randint(15000, 45000)
-        sustainability = random.uniform(8.2, 9.8)
-        satisfaction = random.uniform(8.5, 9.7)
-        
-        data.append({
-            'location': loc['name'],
-            'type': loc['type'],
-            'latitude': loc['lat'],
-            'longitude': loc['lon'],
-            'monthly_visitors': base_visitors,
-            'sustainability_score': sustainability,
-            'satisfaction_score': satisfaction,
-            'carbon_footprint': random.uniform(0.2, 1.8),
-            'monthly_revenue': base_visitors * random.randint(15, 35),
-            'education_programs': random.randint(8, 25),
-            'pestel_score': random.uniform(7.8, 9.5),
-            'vrio_advantage': random.uniform(8.0, 9.8),
-            'community_impact': random.uniform(8.3, 9.6),
-            'innovation_index': random.randint(85, 98)
-        })
+    Only `columns` are read and `filters` ((column, op, value) tuples) are
+    pushed down to the backend. pestel_score and vrio_advantage are scored
+    from the site indicators instead of read.
+    """
+    source = get_data_source(get_data_config())
+    score_filters = [f for f in filters or () if f[0] in SCORE_COLUMNS]
+    if columns is not None and not score_filters and not set(SCORE_COLUMNS) & set(columns):
+        return source.load(columns, filters)
     
-    return pd.DataFrame(data)
+    raw_columns = None
+    if columns is not None:
+        raw_columns = [c for c in dict.fromkeys(['location', *columns, *indicator_columns()]) if c not in SCORE_COLUMNS]
+    sites = source.load(raw_columns, [f for f in filters or () if f[0] not in SCORE_COLUMNS] or None)
+    scores = get_scoring_engine().score(sites)
+    for column in SCORE_COLUMNS:
+        sites[column] = scores[column]
+    sites = apply_filters(sites, score_filters)
+    return sites if columns is None else sites[list(columns)]
+
+def generate_site_scores():
+    """PESTEL factor and VRIO dimension scores for every site"""
+    sites = generate_enhanced_tourism_data(('location', 'type', *indicator_columns()))
+    return pd.concat([sites[['location', 'type']], get_scoring_engine().score(sites)], axis=1)
+
+def impact_level(score):
+    """Qualitative band for a 0-10 score"""
+    return "Very High" if score >= 8.5 else "High" if score >= 7.5 else "Medium" if score >= 6 else "Low"
+
+def history_source():
+    """Backend of the site x month history"""
+    return get_data_source(get_data_config("history", "TOURISM_HISTORY", {"source": "synthetic", "sites": 200, "months": 24}))
 
 @st.cache_data
-def generate_realtime_analytics():
-    """Generate enhanced real-time analytics"""
-    current_time = datetime.now()
-    time_points = [current_time - timedelta(minutes=i) for i in range(60, 0, -2)]
-    
-    return pd.DataFrame({
-        'timestamp': time_points,
-        'visitor_flow': [120 + 40*np.sin(i*0.15) + random.randint(-12, 12) for i in range(30)],
-        'carbon_offset': [30 + 15*np.cos(i*0.12) + random.randint(-3, 3) for i in range(30)],
-        'satisfaction': [8.7 + 0.6*np.sin(i*0.08) + random.uniform(-0.15, 0.15) for i in range(30)],
-        'revenue_rate': [85 + 25*np.cos(i*0.18) + random.randint(-8, 8) for i in range(30)],
-        'sustainability_index': [9.1 + 0.3*np.sin(i*0.1) + random.uniform(-0.1, 0.1) for i in range(30)]
+def generate_site_history(columns=None, filters=None):
+    """Load site x month history used by the statistical engines"""
+    return history_source().load(columns, filters)
+
+FORECAST_MODEL_PATH = os.getenv("FORECAST_MODEL_PATH", os.path.join(".cache", "forecast_model.npz"))
+FORECAST_HORIZON = int(os.getenv("FORECAST_HORIZON", 6))
+FORECAST_SITE_CHOICES = 100
+
+@st.cache_data(show_spinner=False)
+def forecast_site_visitors(horizon=FORECAST_HORIZON):
+    """Visitor history and forecasts with 90% intervals per site, warm-started from the saved model"""
+    keys, months, values = visitor_matrix(generate_site_history(('month', 'location', 'monthly_visitors')))
+    model = VisitorForecaster.load(FORECAST_MODEL_PATH)
+    model.update(keys, months, values)
+    model.save(FORECAST_MODEL_PATH)
+    forecast_months, mean, lower, upper = model.forecast(horizon)
+    rows = pd.Index(model.keys).get_indexer(keys)
+    return keys, months, values, forecast_months, mean[rows], lower[rows], upper[rows]
+
+CARBON_ACTIVITY_PATH = os.getenv("CARBON_ACTIVITY_PATH")
+
+@st.cache_resource
+def get_carbon_ledger():
+    """Process-wide per-site, per-day carbon aggregates, seeded with synthetic visits if no activity path is set"""
+    ledger = CarbonLedger(int(os.getenv("CARBON_RETENTION_DAYS", 90)))
+    if not CARBON_ACTIVITY_PATH:
+        locations = generate_site_history(('location',))['location'].astype(str).unique()
+        ledger.ingest(synthetic_activity(locations, days=30, visits_per_day=40))
+    return ledger
+
+@st.cache_data(ttl=60, show_spinner=False)
+def refresh_carbon_ledger():
+    """Ingest activity records appended since the last refresh (at most once a minute)"""
+    if CARBON_ACTIVITY_PATH and os.path.exists(CARBON_ACTIVITY_PATH):
+        return get_carbon_ledger().ingest_path(CARBON_ACTIVITY_PATH)
+    return 0
+
+def carbon_kpis():
+    """Pre-aggregated carbon totals for the KPI tiles"""
+    refresh_carbon_ledger()
+    return get_carbon_ledger().kpis()
+
+def measured_carbon_per_visitor():
+    """Ledger kg CO2e per visitor by site, as of the latest ingest"""
+    refresh_carbon_ledger()
+    return get_carbon_ledger().per_site()['kg_per_visitor']
+
+@st.cache_data(show_spinner=False)
+def capacity_sites(measured):
+    """Next month's forecast demand and carbon per visitor for every history site
+
+    measured (measured_carbon_per_visitor) is an argument so the cache
+    entry changes whenever newly ingested activity does.
+    """
+    keys, _, _, forecast_months, mean, _, _ = forecast_site_visitors()
+    carbon = generate_site_history(('location', 'carbon_footprint')).groupby('location', observed=True)['carbon_footprint'].last()
+    carbon.index = carbon.index.astype(str)
+    # Measured kg CO2e per visitor when the ledger covers every site (mixing scales would skew the cap)
+    if measured.reindex(keys).notna().all():
+        carbon = measured
+    sites = pd.DataFrame({
+        'location': keys,
+        'monthly_visitors': mean[:, 0],
+        'carbon_footprint': carbon.reindex(keys).fillna(carbon.mean()).to_numpy()
     })
+    return sites, forecast_months[0]
+
+CAPACITY_SCENARIOS = {
+    "📍 Baseline": {'capacity_scale': 1.0, 'shift_hours': 0, 'carbon_budget': 1.0},
+    "🔀 Flexible Slots": {'capacity_scale': 1.0, 'shift_hours': 2, 'carbon_budget': 1.0},
+    "🌱 Low-Carbon": {'capacity_scale': 1.0, 'shift_hours': 2, 'carbon_budget': 0.85}
+}
+
+MAP_COLUMNS = ('location', 'type', 'latitude', 'longitude', 'monthly_visitors', 'sustainability_score')
+MAP_STYLE = os.getenv("MAP_STYLE", "carto-darkmatter")
+
+@st.cache_resource
+def get_site_index():
+    """Spatial index over the configured sites' coordinates"""
+    sites = generate_enhanced_tourism_data(MAP_COLUMNS)
+    return sites, GridIndex(sites['latitude'], sites['longitude'])
+
+REALTIME_TICK_SECONDS = float(os.getenv("REALTIME_TICK_SECONDS", 5))
+REALTIME_WINDOW = os.getenv("REALTIME_WINDOW", "1h")
+REALTIME_RESOLUTION = os.getenv("REALTIME_RESOLUTION", "2min")
+REALTIME_ZOOM_WINDOWS = {"All": None, "Last 6h": "6h", "Last 1h": "1h", "Last 15 min": "15min", "Last 5 min": "5min"}
+
+@st.cache_resource
+def get_realtime_feed(window=REALTIME_WINDOW, resolution=REALTIME_RESOLUTION):
+    """Process-wide real-time feed, recomputed at most once per tick"""
+    return RealtimeFeed(window, resolution, tick_seconds=REALTIME_TICK_SECONDS)
+
+def generate_realtime_analytics(window=REALTIME_WINDOW, resolution=REALTIME_RESOLUTION):
+    """Generate enhanced real-time analytics"""
+    return get_realtime_feed(window, resolution).snapshot()
+
+SENSOR_STORE_DIR = os.getenv("SENSOR_STORE_DIR", os.path.join(".cache", "sensors"))
+SENSOR_LISTEN = os.getenv("SENSOR_LISTEN", "")
+
+@st.cache_resource
+def get_sensor_store():
+    """Process-wide sensor ring buffers, fed by a UDP listener only when SENSOR_LISTEN is set"""
+    prefixes = [prefix.strip() for prefix in os.getenv("SENSOR_PREFIXES", "").split(",") if prefix.strip()]
+    store = SensorStore(SENSOR_STORE_DIR, int(os.getenv("SENSOR_CAPACITY", SENSOR_CAPACITY)),
+                        int(os.getenv("SENSOR_MAX_METRICS", SENSOR_MAX_METRICS)), prefixes)
+    if SENSOR_LISTEN:
+        host, _, port = SENSOR_LISTEN.rpartition(":")
+        try:
+            SensorListener(store, host or "127.0.0.1", int(port)).start()
+        except OSError:
+            pass  # Port taken, e.g. by another app process writing the same rings: read only
+    return store
+
+def sensor_window(metrics, window=REALTIME_WINDOW):
+    """Zero-copy (epoch seconds, values) views of each metric's samples in the window; empty metrics left out"""
+    since = datetime.now().timestamp() - pd.Timedelta(window).total_seconds()
+    views = {metric: get_sensor_store().since(metric, since) for metric in metrics}
+    return {metric: view for metric, view in views.items() if len(view[0])}
+
+def epoch_to_local(seconds):
+    """Naive local timestamps, matching the synthetic feed's, from epoch seconds"""
+    return pd.to_datetime(seconds, unit='s', utc=True).tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None)
+
+def local_to_epoch(timestamps):
+    """Epoch seconds from naive local timestamps"""
+    local = pd.DatetimeIndex(timestamps).tz_localize(datetime.now().astimezone().tzinfo)
+    return ((local - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy()
+
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", 4.0))
+ANOMALY_LIST_ROWS = 100
+
+@st.cache_resource
+def get_anomaly_monitor():
+    """Process-wide online anomaly state over the live metrics"""
+    return AnomalyMonitor(AnomalyDetector(threshold=ANOMALY_THRESHOLD))
+
+def refresh_anomalies():
+    """Test samples that arrived since the last call: every sensor metric, plus the synthetic feed (as feed.<column>) while no sensor covers it"""
+    monitor, store = get_anomaly_monitor(), get_sensor_store()
+    monitor.observe_rings({metric: store.ring(metric) for metric in store.metrics()})
+    columns = [column for column in REALTIME_COLUMNS if column not in sensor_window(REALTIME_COLUMNS)]
+    if columns:
+        frame = generate_realtime_analytics()
+        monitor.observe_frame("feed", local_to_epoch(frame['timestamp']), frame, columns)
+    return monitor
+
+def generate_live_metrics(tick):
+    """Dashboard KPI values, fixed for the duration of a tick"""
+    rng = np.random.default_rng(tick)
+    carbon = carbon_kpis()
+    if carbon:
+        saved = carbon['latest']['saved_kg']
+        change = carbon['previous'] and f"{saved - carbon['previous']['saved_kg']:+,.0f}kg"
+        carbon_tile = ("🌱 Carbon Saved", f"{saved:,.0f}kg", change)
+    else:
+        carbon_tile = ("🌱 Carbon Saved", "—", None)
+    return [
+        ("🔥 Live Visitors", f"{rng.integers(32000, 48001):,}", "↗️ 23%"),
+        ("🧠 AI Accuracy", f"{rng.uniform(94.2, 97.8):.1f}%", "↗️ 2.1%"),
+        carbon_tile,
+        ("💰 Revenue", f"${rng.integers(420000, 580001):,}", "↗️ 31%"),
+        ("⚡ Efficiency", f"{rng.integers(94, 99)}%", "↗️ 4%")
+    ]
+
+# Per-category price and capacity ranges and strategy, keyed by the classifier's categories
+IMAGE_CATEGORY_PROFILES = {
+    'Premium Eco-Resort Location': {
+        'market_value': (2800, 4500, "${:,.0f}/night"),
+        'visitor_capacity': (150, 300, "{:.0f} guests"),
+        'recommendations': [
+            'Develop luxury eco-glamping facilities',
+            'Implement AI-powered visitor management',
+            'Create blockchain carbon credit program',
+            'Establish virtual reality preview experiences'
+        ]
+    },
+    'Cultural Heritage Destination': {
+        'market_value': (180, 350, "${:,.0f}/person"),
+        'visitor_capacity': (500, 1200, "{:.0f} daily"),
+        'recommendations': [
+            'Digital heritage preservation initiatives',
+            'Augmented reality cultural tours',
+            'Community artisan partnership programs',
+            'Sustainable visitor flow optimization'
+        ]
+    }
+}
+
+@st.cache_resource
+def get_image_cache():
+    """Process-wide thumbnail and analysis cache, keyed by image content"""
+    return ImageCache(os.getenv("IMAGE_CACHE_DIR", os.path.join(".cache", "images")))
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 0)) or None
+IMAGES_PER_PAGE = 12
+
+def build_image_report(uploaded_file, image, digest, cached):
+    """Page-ready analysis for one image from its cached features"""
+    file_details = {
+        'name': uploaded_file.name,
+        'size': f"{uploaded_file.size/1024:.1f} KB",
+        'type': uploaded_file.type
+    }
+    if 'error' in image:
+        return {'success': False, 'file_info': file_details, 'error': image['error']}
+    
+    scores = image['scores']
+    profile = IMAGE_CATEGORY_PROFILES[image['category']]
+    
+    # Place the site within its category's range by tourism potential
+    position = scores['tourism_potential'] / 10
+    def in_range(low, high, template):
+        return template.format(low + (high - low) * position)
+    
+    return {
+        'success': True,
+        'file_info': file_details,
+        'digest': digest,
+        'thumbnail': get_image_cache().thumbnail_path(digest),
+        'cached': cached,
+        'source': "near-duplicate" if 'duplicate_of' in image else "cache" if cached else "new",
+        'analysis': {
+            'category': image['category'],
+            'tourism_potential': scores['tourism_potential'],
+            'sustainability_score': scores['sustainability_score'],
+            'market_value': in_range(*profile['market_value']),
+            'visitor_capacity': in_range(*profile['visitor_capacity']),
+            'pestel_rating': (scores['tourism_potential'] + scores['sustainability_score']) / 2,
+            'vrio_score': scores['tourism_potential'] * (0.5 + 0.5 * image['probability']),
+            'recommendations': profile['recommendations']
+        },
+        'features': image['features'],
+        'enhanced_metrics': {
+            'category_score': image['probability'] * 100,
+            'processing_time': f"{image['timings']['total'] * 1000:.0f} ms"
+                               + (" (cached)" if cached or 'duplicate_of' in image else ""),
+            'data_points': image['pixels'],
+            'quality_score': scores['quality_score']
+        }
+    }
+
+def analyze_multimodal_images(uploaded_files, on_progress=None):
+    """Reports for every upload; images seen before are not decoded again"""
+    # Hash each upload once per session; reruns look it up by file_id
+    digests = st.session_state.setdefault('image_digests', {})
+    items = []
+    for uploaded_file in uploaded_files:
+        if uploaded_file.file_id not in digests:
+            digests[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+        items.append((digests[uploaded_file.file_id], uploaded_file))
+    
+    reports = [None] * len(items)
+    for done, (index, digest, image, cached) in enumerate(
+            get_image_cache().analyze_many(items, IMAGE_WORKERS), 1):
+        reports[index] = build_image_report(uploaded_files[index], image, digest, cached)
+        if on_progress:
+            on_progress(done, len(items))
+    return reports
 
-# Simple multimodal image analysis
 def analyze_multimodal_image(uploaded_file):
     """Enhanced multimodal image analysis"""
     try:
-        file_details = {
-            'name': uploaded_file.name,
-            'size': f"{uploaded_file.size/1024:.1f} KB",
-            'type': uploaded_file.type
-        }
-        
-        # Simulate advanced AI analysis
-        analysis_types = [
-            {
-                'category': 'Premium Eco-Resort Location',
-                'tourism_potential': random.uniform(8.7, 9.8),
-                'sustainability_score': random.uniform(8.9, 9.7),
-                'market_value': f"${random.randint(2800, 4500)}/night",
-                'visitor_capacity': f"{random.randint(150, 300)} guests",
-                'pestel_rating': random.uniform(8.5, 9.4),
-                'vrio_score': random.uniform(8.3, 9.6),
-                'recommendations': [
-                    'Develop luxury eco-glamping facilities',
-                    'Implement AI-powered visitor management',
-                    'Create blockchain carbon credit program',
-                    'Establish virtual reality preview experiences'
-                ]
-            },
-            {
-                'category': 'Cultural Heritage Destination',
-                'tourism_potential': random.uniform(8.4, 9.5),
-                'sustainability_score': random.uniform(8.6, 9.4),
-                'market_value': f"${random.randint(180, 350)}/person",
-                'visitor_capacity': f"{random.randint(500, 1200)} daily",
-                'pestel_rating': random.uniform(8.2, 9.1),
-                'vrio_score': random.uniform(8.7, 9.5),
-                'recommendations': [
-                    'Digital heritage preservation initiatives',
-                    'Augmented reality cultural tours',
-                    'Community artisan partnership programs',
-                    'Sustainable visitor flow optimization'
-                ]
-            }
-        ]
-        
-        selected = random.choice(analysis_types)
-        
-        return {
-            'success': True,
-            'file_info': file_details,
-            'analysis': selected,
-            'enhanced_metrics': {
-                'ai_confidence': random.uniform(92, 98),
-                'processing_time': f"{random.uniform(0.8, 2.3):.1f}s",
-                'data_points': random.randint(1847, 3921),
-                'quality_score': random.uniform(8.9, 9.8)
-            }
-        }
+        return analyze_multimodal_images([uploaded_file])[0]
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
@@ -551,9 +930,16 @@ def main():
         config = get_config()
         if config["active"]:
             st.success("🟢 AI Enhanced Mode: ACTIVE")
-            st.info("🧠 qwen/qwq-32b:free • OpenRouter")
+            st.info(f"🧠 {config['model']} • OpenRouter")
+            cache_stats = get_response_cache().stats()
+            flight_stats = get_flight_group().stats()
+            st.caption(f"⚡ Response cache: {cache_stats['hits']} hits • {cache_stats['misses']} misses • "
+                       f"{cache_stats['hit_rate']:.0%} hit rate • {flight_stats['joined']} coalesced")
         else:
             st.warning("🟡 Demo Mode: Active")
+        knowledge = refresh_knowledge_index()
+        if knowledge['chunks']:
+            st.caption(f"📚 Knowledge base: {knowledge['chunks']:,} passages from {knowledge['documents']} documents")
         
         st.markdown("---")
         
@@ -564,7 +950,8 @@ def main():
             "💎 VRIO Framework",
             "📈 Intra-Variable Effects",
             "📸 Multimodal Analysis",
-            "🌍 Sustainability Intelligence"
+            "🌍 Sustainability Intelligence",
+            "🗂️ Batch Analysis"
         ])
         
         st.markdown("#### 📈 LIVE METRICS")
@@ -589,99 +976,254 @@ def main():
         show_multimodal_analysis()
     elif page == "🌍 Sustainability Intelligence":
         show_sustainability_intelligence()
+    elif page == "🗂️ Batch Analysis":
+        show_batch_analysis()
 
 def show_enhanced_dashboard():
     """Enhanced dashboard with advanced metrics"""
     st.subheader("🚀 ENHANCED AI DASHBOARD")
     
     # Real-time metrics with enhanced styling
-    col1, col2, col3, col4, col5 = st.columns(5)
-    
-    metrics = [
-        ("🔥 Live Visitors", f"{random.randint(32000, 48000):,}", "↗️ 23%"),
-        ("🧠 AI Accuracy", f"{random.uniform(94.2, 97.8):.1f}%", "↗️ 2.1%"),
-        ("🌱 Carbon Saved", f"{random.randint(2800, 4200)}kg", "↗️ 267kg"),
-        ("💰 Revenue", f"${random.randint(420000, 580000):,}", "↗️ 31%"),
-        ("⚡ Efficiency", f"{random.randint(94, 98)}%", "↗️ 4%")
-    ]
-    
-    for i, (col, (label, value, delta)) in enumerate(zip([col1, col2, col3, col4, col5], metrics)):
-        with col:
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.metric(label, value, delta)
-            st.markdown('</div>', unsafe_allow_html=True)
+    show_live_metrics()
     
     # Enhanced analytics charts
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### 📈 REAL-TIME ANALYTICS")
-        realtime_data = generate_realtime_analytics()
-        
-        fig = px.line(realtime_data, x='timestamp', y=['visitor_flow', 'sustainability_index'], 
-                     title="Multi-Variable Performance Tracking")
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)', 
-            plot_bgcolor='rgba(0,0,0,0)', 
-            font_color='#66ff99',
-            legend=dict(bgcolor='rgba(0,0,0,0)')
-        )
-        fig.update_traces(line_width=3)
-        st.plotly_chart(fig, use_container_width=True)
+        show_realtime_chart()
     
     with col2:
         st.markdown("#### 🗺️ STRATEGIC POSITIONING")
-        location_data = generate_enhanced_tourism_data()
+        location_data = generate_enhanced_tourism_data(
+            ('location', 'sustainability_score', 'satisfaction_score', 'monthly_visitors', 'vrio_advantage')
+        )
         
-        fig = px.scatter(location_data, 
-                        x='sustainability_score', 
-                        y='satisfaction_score',
-                        size='monthly_visitors', 
-                        color='vrio_advantage',
-                        hover_name='location',
-                        title="VRIO vs Sustainability Matrix")
+        if len(location_data) > SCATTER_DENSITY_THRESHOLD:
+            # Too many sites to ship as markers: bin on the server and send the grid
+            x, y, z = density_grid(location_data['sustainability_score'], location_data['satisfaction_score'])
+            fig = go.Figure(go.Heatmap(x=x, y=y, z=z, colorscale='Viridis', colorbar_title='Sites',
+                                       hovertemplate='Sustainability %{x:.2f}<br>Satisfaction %{y:.2f}<br>%{z} sites<extra></extra>'))
+            fig.update_layout(title=f"Site Density: Sustainability vs Satisfaction ({len(location_data):,} sites)",
+                              xaxis_title='sustainability_score', yaxis_title='satisfaction_score')
+        else:
+            fig = px.scatter(location_data, 
+                            x='sustainability_score', 
+                            y='satisfaction_score',
+                            size='monthly_visitors', 
+                            color='vrio_advantage',
+                            hover_name='location',
+                            title="VRIO vs Sustainability Matrix")
         fig.update_layout(
             paper_bgcolor='rgba(0,0,0,0)', 
             plot_bgcolor='rgba(0,0,0,0)', 
             font_color='#66ff99'
         )
         st.plotly_chart(fig, use_container_width=True)
+    
+    show_visitor_forecast()
+    show_site_map()
+
+def show_visitor_forecast():
+    """Monthly visitors with the forecast and its interval band, for all sites or one"""
+    st.markdown("#### 🔮 VISITOR DEMAND FORECAST")
+    keys, months, values, forecast_months, mean, lower, upper = forecast_site_visitors()
+    
+    largest = np.argsort(-np.nan_to_num(values[:, -1]))[:FORECAST_SITE_CHOICES]
+    site = st.selectbox("📍 Site", ["All sites"] + list(keys[largest]), key="forecast_site")
+    if site == "All sites":
+        observed = np.nansum(values, axis=0)
+        expected, low, high = aggregate_forecast(mean, lower, upper)
+    else:
+        row = int(np.flatnonzero(keys == site)[0])
+        observed, expected, low, high = values[row], mean[row], lower[row], upper[row]
+    
+    history_x, forecast_x = months.to_timestamp(), forecast_months.to_timestamp()
+    # Start the forecast line at the last observation so the two join up
+    line_x = history_x[-1:].append(forecast_x)
+    fig = go.Figure([
+        go.Scatter(x=forecast_x.append(forecast_x[::-1]), y=np.concatenate([high, low[::-1]]),
+                   fill='toself', fillcolor='rgba(102,255,153,0.2)', line_width=0,
+                   name='90% interval', hoverinfo='skip'),
+        go.Scatter(x=history_x, y=observed, name='Observed', mode='lines', line=dict(color='#00ff88', width=3)),
+        go.Scatter(x=line_x, y=np.concatenate([observed[-1:], expected]), name='Forecast', mode='lines',
+                   line=dict(color='#66ff99', width=3, dash='dash'))
+    ])
+    fig.update_layout(
+        title=f"Monthly Visitors: {site} ({len(forecast_x)}-month Holt-Winters forecast)",
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(0,0,0,0)', 
+        font_color='#66ff99',
+        legend=dict(bgcolor='rgba(0,0,0,0)')
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_site_map():
+    """Map of sites within a radius, served from the spatial index"""
+    st.markdown("#### 🛰️ ECO-SITE MAP")
+    sites, index = get_site_index()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        center_lat = st.number_input("📍 Center latitude", -90.0, 90.0, round(float(sites['latitude'].mean()), 2), step=0.5)
+    with col2:
+        center_lon = st.number_input("📍 Center longitude", -180.0, 180.0, round(float(sites['longitude'].mean()), 2), step=0.5)
+    with col3:
+        radius_km = st.slider("📏 Radius (km)", 10, 3000, 1500, step=10)
+    
+    # Only the sites inside the viewport are sent to the browser
+    rows, distance = index.query_radius(center_lat, center_lon, radius_km, return_distance=True)
+    visible = sites.iloc[rows]
+    st.caption(f"🗺️ {len(visible):,} of {len(sites):,} sites within {radius_km:,} km")
+    
+    if len(visible) > SCATTER_DENSITY_THRESHOLD:
+        trace = go.Densitymap(lat=visible['latitude'], lon=visible['longitude'], z=visible['monthly_visitors'],
+                              radius=8, colorscale='Viridis', colorbar_title='Visitors')
+    else:
+        trace = go.Scattermap(
+            lat=visible['latitude'], lon=visible['longitude'], mode='markers',
+            marker=dict(size=10, color=visible['sustainability_score'], colorscale='Viridis',
+                        colorbar_title='Sustainability'),
+            text=visible['location'].astype(str),
+            customdata=np.stack([visible['type'].astype(str), distance.round(1)], axis=-1),
+            hovertemplate='<b>%{text}</b><br>%{customdata[0]}<br>%{customdata[1]} km from center<extra></extra>'
+        )
+    
+    fig = go.Figure(trace)
+    fig.update_layout(
+        map=dict(style=MAP_STYLE, center=dict(lat=center_lat, lon=center_lon), zoom=zoom_for_radius(radius_km)),
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#66ff99',
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=450
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+# Live panels rerun on their own every tick instead of rerunning the whole page
+@st.fragment(run_every=REALTIME_TICK_SECONDS)
+def show_live_metrics():
+    """Auto-refreshing KPI row"""
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    metrics = generate_live_metrics(get_realtime_feed().current_tick())
+    
+    for col, (label, value, delta) in zip([col1, col2, col3, col4, col5], metrics):
+        with col:
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric(label, value, delta)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment(run_every=REALTIME_TICK_SECONDS)
+def show_realtime_chart():
+    """Auto-refreshing multi-variable line chart"""
+    columns = ['visitor_flow', 'sustainability_index']
+    # Sensor readings when any have arrived within the window, else the synthetic feed
+    live = sensor_window(columns)
+    if live:
+        points = max(len(timestamps) for timestamps, _ in live.values())
+        end = max(timestamps[-1] for timestamps, _ in live.values())
+        st.caption(f"📡 Live sensors: {points:,} samples in the last {REALTIME_WINDOW}")
+    else:
+        realtime_data = generate_realtime_analytics()
+        points = len(realtime_data)
+        end = realtime_data['timestamp'].iloc[-1]
+    
+    # Zooming re-slices the feed, so the visible range is resampled at higher resolution
+    x_range = None
+    if points > MAX_POINTS_PER_TRACE:
+        zoom = st.select_slider("🔍 Zoom", options=list(REALTIME_ZOOM_WINDOWS), key="realtime_zoom")
+        if REALTIME_ZOOM_WINDOWS[zoom]:
+            span = pd.Timedelta(REALTIME_ZOOM_WINDOWS[zoom])
+            x_range = (end - span.total_seconds(), end) if live else (end - span, end)
+    
+    if live:
+        series = {}
+        for column, (timestamps, values) in live.items():
+            x, y = downsample_xy(timestamps, values, x_range=x_range)
+            series[column] = (epoch_to_local(x), y)
+    else:
+        series = downsample_series(realtime_data, 'timestamp', columns, x_range=x_range)
+    fig = go.Figure([
+        go.Scatter(x=x, y=y, name=column, mode='lines', line_width=3)
+        for column, (x, y) in series.items()
+    ])
+    
+    # Flagged points inside the plotted span
+    since = datetime.now().timestamp() - pd.Timedelta(REALTIME_WINDOW).total_seconds()
+    anomalies = refresh_anomalies().events(columns if live else [f"feed.{column}" for column in columns], since)
+    if len(anomalies):
+        fig.add_trace(go.Scatter(
+            x=epoch_to_local(anomalies['timestamp'].to_numpy()), y=anomalies['value'], name='⚠️ anomaly',
+            mode='markers', marker=dict(color='#ff4444', size=11, symbol='x'),
+            text=anomalies['series'] + ' (' + anomalies['test'] + ' test)', hoverinfo='text+x+y'
+        ))
+    fig.update_layout(
+        title="Multi-Variable Performance Tracking",
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(0,0,0,0)', 
+        font_color='#66ff99',
+        legend=dict(bgcolor='rgba(0,0,0,0)'),
+        uirevision='realtime'  # keep zoom/legend state across refreshes
+    )
+    st.plotly_chart(fig, use_container_width=True, key="realtime_chart")
+
+ANALYSIS_TYPES = ["general", "pestel", "vrio", "multimodal", "intra_variable"]
 
 def show_multimodal_chat():
     """Enhanced AI chat with multimodal capabilities"""
     st.subheader("🤖 AI MULTIMODAL INTELLIGENCE")
     
     # Analysis type selector
-    analysis_type = st.selectbox("🎯 Analysis Framework", [
-        "general", "pestel", "vrio", "multimodal", "intra_variable"
-    ])
+    analysis_type = st.selectbox("🎯 Analysis Framework", ANALYSIS_TYPES)
     
-    # Chat interface
-    user_query = st.text_area("💭 Ask about sustainable tourism:", height=100)
+    # Conversation so far, newest turns only; older ones live on in the summary
+    prune_chat_history()
+    store, session = get_chat_store(), chat_session_id()
+    total = store.count(session)
+    if total > CHAT_DISPLAY_MESSAGES:
+        st.caption(f"🗂️ {total - CHAT_DISPLAY_MESSAGES} earlier messages are summarized into the AI context")
+    for message in store.history(session, CHAT_DISPLAY_MESSAGES):
+        with st.chat_message(message['role']):
+            st.markdown(message['content'])
     
-    col1, col2, col3 = st.columns([2, 1, 1])
-    with col1:
-        if st.button("📤 Enhanced Analysis", type="primary") and user_query:
+    user_query = st.chat_input("💭 Ask about sustainable tourism...")
+    if user_query:
+        context = store.context(session, CHAT_CONTEXT_TOKENS, summarize_turns)
+        store.append(session, "user", user_query)
+        with st.chat_message("user"):
+            st.markdown(user_query)
+        
+        with st.chat_message("assistant"):
+            if analysis_type == "general":
+                intent, confidence = get_intent_router().route(user_query)
+                st.caption(f"🧭 Routed to {intent} ({confidence:.0%} confidence)")
+            chunks = []
+            def record(stream):
+                for chunk in stream:
+                    chunks.append(chunk)
+                    yield chunk
             with st.spinner("🧠 AI Processing with Real-Time Enhancement..."):
-                response = get_enhanced_ai_response(user_query, analysis_type)
-            
-            st.markdown("**🧑 Query:**")
-            st.info(user_query)
-            
-            st.markdown("**🤖 Enhanced AI Response:**")
-            st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
-            st.markdown(response)
-            st.markdown('</div>', unsafe_allow_html=True)
+                st.write_stream(record(get_enhanced_ai_response(user_query, analysis_type, stream=True,
+                                                                 history=context)))
+        # History keeps the answer itself, not markers, warnings or source footers
+        store.append(session, "assistant", "".join(c for c in chunks if not isinstance(c, Annotation)).strip())
     
-    with col2:
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
         if st.button("📊 Quick PESTEL"):
             st.success("📊 **PESTEL Analysis**")
-            st.markdown(generate_pestel_analysis("market analysis"))
+            # Same key for every session, so simultaneous clicks share one model call
+            st.write_stream(get_enhanced_ai_response("market analysis", "pestel", stream=True))
     
-    with col3:
+    with col2:
         if st.button("💎 Quick VRIO"):
             st.success("💎 **VRIO Framework**")
-            st.markdown(generate_vrio_analysis("competitive advantage"))
+            st.write_stream(get_enhanced_ai_response("competitive advantage", "vrio", stream=True))
+    
+    with col3:
+        if st.button("🧹 Clear Conversation") and total:
+            store.clear(session)
+            st.rerun()
 
 def show_pestel_analysis():
     """Dedicated PESTEL analysis page"""
@@ -693,23 +1235,24 @@ def show_pestel_analysis():
     pestel_query = st.text_input("🎯 Enter tourism scenario for PESTEL analysis:")
     
     if st.button("🚀 Generate PESTEL Analysis") and pestel_query:
-        with st.spinner("🔄 Conducting comprehensive PESTEL analysis..."):
-            analysis = get_enhanced_ai_response(pestel_query, "pestel")
-        
         st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
-        st.markdown(analysis)
+        with st.spinner("🔄 Conducting comprehensive PESTEL analysis..."):
+            st.write_stream(get_enhanced_ai_response(pestel_query, "pestel", stream=True))
         st.markdown('</div>', unsafe_allow_html=True)
     
-    # Sample PESTEL dashboard
+    # PESTEL dashboard scored from the site indicators
     st.markdown("#### 📈 PESTEL SCORE DASHBOARD")
-    pestel_data = {
-        'Factor': ['Political', 'Economic', 'Social', 'Technological', 'Environmental', 'Legal'],
-        'Score': [8.7, 9.2, 8.9, 9.5, 9.1, 8.8],
-        'Impact': ['Medium', 'High', 'High', 'Very High', 'High', 'Medium']
-    }
+    site_scores = generate_site_scores()
+    factor_scores = site_scores[list(PESTEL_WEIGHTS)].mean()
+    pestel_data = pd.DataFrame({
+        'Factor': factor_scores.index,
+        'Score': factor_scores.round(2).to_numpy(),
+        'Impact': [impact_level(score) for score in factor_scores]
+    })
     
     fig = px.bar(pestel_data, x='Factor', y='Score', color='Score',
-                 title="PESTEL Factors Assessment", 
+                 hover_data=['Impact'],
+                 title=f"PESTEL Factors Assessment ({len(site_scores):,} sites)", 
                  color_continuous_scale='Viridis')
     fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color='#66ff99')
     st.plotly_chart(fig, use_container_width=True)
@@ -724,30 +1267,46 @@ def show_vrio_framework():
     vrio_query = st.text_input("🎯 Enter resource/capability for VRIO analysis:")
     
     if st.button("💎 Generate VRIO Analysis") and vrio_query:
-        with st.spinner("⚡ Analyzing competitive advantage..."):
-            analysis = get_enhanced_ai_response(vrio_query, "vrio")
-        
         st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
-        st.markdown(analysis)
+        with st.spinner("⚡ Analyzing competitive advantage..."):
+            st.write_stream(get_enhanced_ai_response(vrio_query, "vrio", stream=True))
         st.markdown('</div>', unsafe_allow_html=True)
     
     # VRIO Matrix visualization
     st.markdown("#### 🎯 VRIO COMPETITIVE ADVANTAGE MATRIX")
-    vrio_matrix = pd.DataFrame({
-        'Resource': ['AI Technology', 'Brand Recognition', 'Partnerships', 'Location', 'Expertise'],
-        'Value': [9.5, 8.7, 9.1, 9.8, 8.9],
-        'Rarity': [9.2, 7.8, 8.5, 9.6, 8.3],
-        'Imitability': [8.9, 8.1, 7.9, 9.4, 8.7],
-        'Organization': [9.3, 8.6, 8.8, 9.1, 9.0]
-    })
+    site_scores = generate_site_scores()
+    # One line per site while readable, otherwise one per site type
+    group = 'location' if len(site_scores) <= 12 else 'type'
+    vrio_matrix = site_scores.groupby(group, observed=True)[list(VRIO_WEIGHTS)].mean().reset_index()
     
     fig = px.parallel_coordinates(vrio_matrix, 
+                                 dimensions=list(VRIO_WEIGHTS),
                                  color='Value',
                                  title="VRIO Resource Analysis",
                                  color_continuous_scale='Viridis')
     fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color='#66ff99')
     st.plotly_chart(fig, use_container_width=True)
 
+CORRELATION_VARIABLES = {
+    'sustainability_score': 'Sustainability',
+    'satisfaction_score': 'Satisfaction',
+    'monthly_revenue': 'Revenue',
+    'carbon_footprint': 'Environment',
+    'community_impact': 'Community',
+    'monthly_visitors': 'Visitors'
+}
+
+@st.cache_resource
+def get_correlation_moments():
+    """Process-wide running moments of the correlation variables over the history"""
+    return StreamingCovariance(CORRELATION_VARIABLES)
+
+def update_correlation_moments():
+    """Fold history from the newest month already seen (which may have grown) on into the running moments"""
+    columns = ('month', *CORRELATION_VARIABLES)
+    load = lambda since: history_source().load(columns, None if since is None else [('month', '>=', since)])
+    return get_correlation_moments().update_from(load, 'month')
+
 def show_intra_variable_analysis():
     """Dedicated intra-variable effects analysis"""
     st.subheader("📈 INTRA-VARIABLE DIRECT EFFECT ANALYSIS")
@@ -756,26 +1315,92 @@ def show_intra_variable_analysis():
     var_query = st.text_input("🔗 Enter variables for relationship analysis:")
     
     if st.button("📊 Analyze Variable Effects") and var_query:
-        with st.spinner("🧮 Computing intra-variable relationships..."):
-            analysis = get_enhanced_ai_response(var_query, "intra_variable")
-        
         st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
-        st.markdown(analysis)
+        with st.spinner("🧮 Computing intra-variable relationships..."):
+            st.write_stream(get_enhanced_ai_response(var_query, "intra_variable", stream=True))
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Variable correlation heatmap
     st.markdown("#### 🌡️ VARIABLE CORRELATION MATRIX")
-    variables = ['Sustainability', 'Satisfaction', 'Revenue', 'Environment', 'Community']
-    correlation_matrix = np.random.rand(5, 5)
-    correlation_matrix = (correlation_matrix + correlation_matrix.T) / 2
-    np.fill_diagonal(correlation_matrix, 1)
+    method = st.radio("📐 Method", ["Pearson", "Spearman", "Partial"], horizontal=True)
+    
+    # Pearson and partial come from running moments; rank correlations need the whole history
+    if method == "Spearman":
+        report = cached_correlation_report(generate_site_history(tuple(CORRELATION_VARIABLES)), list(CORRELATION_VARIABLES))
+    else:
+        report = update_correlation_moments().report()
+    variables = list(CORRELATION_VARIABLES.values())
+    correlation_matrix = report[method.lower()].to_numpy()
+    p_values = report[f"{method.lower()}_p"].to_numpy()
     
     fig = px.imshow(correlation_matrix, 
                     x=variables, y=variables,
                     color_continuous_scale='RdYlGn',
-                    title="Variable Relationship Heatmap")
+                    zmin=-1, zmax=1,
+                    text_auto='.2f',
+                    title=f"Variable Relationship Heatmap ({method}, n = {report['n']:,})")
+    fig.update_traces(customdata=p_values, hovertemplate='%{y} ↔ %{x}<br>r = %{z:.3f}<br>p = %{customdata:.2g}<extra></extra>')
     fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', font_color='#66ff99')
     st.plotly_chart(fig, use_container_width=True)
+    
+    with st.expander("📋 Coefficients and p-values"):
+        pairs = pd.DataFrame({
+            'Variable A': np.repeat(variables, len(variables)),
+            'Variable B': np.tile(variables, len(variables)),
+            'r': correlation_matrix.ravel(),
+            'p-value': p_values.ravel()
+        })
+        upper = np.triu(np.ones_like(correlation_matrix, dtype=bool), k=1).ravel()
+        st.dataframe(pairs[upper].sort_values('p-value'), hide_index=True, use_container_width=True)
+
+def show_image_report(analysis):
+    """Detailed results card for one analyzed image"""
+    st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
+    st.markdown("#### 🧠 **AI Analysis Results**")
+    
+    # File information
+    info = analysis['file_info']
+    st.markdown(f"**📁 File:** {info['name']}")
+    st.markdown(f"**📏 Size:** {info['size']}")
+    st.markdown(f"**🎯 Type:** {info['type']}")
+    
+    # Analysis results
+    result = analysis['analysis']
+    st.markdown(f"**🏷️ Category:** {result['category']}")
+    st.markdown(f"**🎯 Tourism Potential:** {result['tourism_potential']:.1f}/10")
+    st.markdown(f"**🌱 Sustainability:** {result['sustainability_score']:.1f}/10")
+    st.markdown(f"**💰 Market Value:** {result['market_value']}")
+    st.markdown(f"**👥 Capacity:** {result['visitor_capacity']}")
+    
+    # Enhanced metrics
+    enhanced = analysis['enhanced_metrics']
+    st.markdown(f"**🧮 Heuristic Category Score:** {enhanced['category_score']:.1f}%")
+    st.markdown(f"**⚡ Processing:** {enhanced['processing_time']}")
+    st.markdown(f"**📊 Data Points:** {enhanced['data_points']:,} pixels")
+    
+    features = analysis['features']
+    st.markdown("**🔬 Scene Features:**")
+    st.markdown(f"- 🌿 Green cover: {features['green_cover']:.0%}\n"
+                f"- 🌊 Water / sky: {features['water_fraction']:.0%} / {features['sky_fraction']:.0%}\n"
+                f"- 🏛️ Edge density: {features['edge_density']:.0%}\n"
+                f"- 🎨 Colorfulness: {features['colorfulness']:.2f}")
+    
+    if analysis['source'] == "near-duplicate":
+        st.markdown("**♻️ Near-duplicate** of an earlier upload: its analysis was reused")
+    
+    st.markdown("**💡 Strategic Recommendations:**")
+    for i, rec in enumerate(result['recommendations'], 1):
+        st.markdown(f"{i}. {rec}")
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    similar = get_image_cache().similar(analysis['digest'])
+    if similar:
+        st.markdown("#### 🔍 Similar Sites")
+        for col, (digest, distance, other) in zip(st.columns(len(similar)), similar):
+            with col:
+                st.image(get_image_cache().thumbnail_path(digest), use_container_width=True,
+                         caption=f"{other['category'].split()[0]} • {1 - distance / FINGERPRINT_BITS:.0%} match")
 
 def show_multimodal_analysis():
     """Enhanced multimodal analysis page"""
@@ -783,49 +1408,73 @@ def show_multimodal_analysis():
     
     st.markdown("Upload images for comprehensive AI-powered analysis")
     
-    uploaded_file = st.file_uploader("📁 Select image file", type=['jpg', 'jpeg', 'png', 'webp'])
+    uploaded_files = st.file_uploader("📁 Select image files", type=['jpg', 'jpeg', 'png', 'webp'],
+                                      accept_multiple_files=True)
+    if not uploaded_files:
+        return
     
-    if uploaded_file:
+    if len(uploaded_files) == 1:
         col1, col2 = st.columns([1, 1])
         
-        with col1:
-            st.image(uploaded_file, caption="📸 Uploaded Image", use_column_width=True)
-        
         with col2:
             with st.spinner("🔍 AI Multimodal Analysis in Progress..."):
-                analysis = analyze_multimodal_image(uploaded_file)
+                analysis = analyze_multimodal_image(uploaded_files[0])
             
             if analysis['success']:
-                st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
-                st.markdown("#### 🧠 **AI Analysis Results**")
-                
-                # File information
-                info = analysis['file_info']
-                st.markdown(f"**📁 File:** {info['name']}")
-                st.markdown(f"**📏 Size:** {info['size']}")
-                st.markdown(f"**🎯 Type:** {info['type']}")
-                
-                # Analysis results
-                result = analysis['analysis']
-                st.markdown(f"**🏷️ Category:** {result['category']}")
-                st.markdown(f"**🎯 Tourism Potential:** {result['tourism_potential']:.1f}/10")
-                st.markdown(f"**🌱 Sustainability:** {result['sustainability_score']:.1f}/10")
-                st.markdown(f"**💰 Market Value:** {result['market_value']}")
-                st.markdown(f"**👥 Capacity:** {result['visitor_capacity']}")
-                
-                # Enhanced metrics
-                enhanced = analysis['enhanced_metrics']
-                st.markdown(f"**🤖 AI Confidence:** {enhanced['ai_confidence']:.1f}%")
-                st.markdown(f"**⚡ Processing:** {enhanced['processing_time']}")
-                st.markdown(f"**📊 Data Points:** {enhanced['data_points']:,}")
-                
-                st.markdown("**💡 Strategic Recommendations:**")
-                for i, rec in enumerate(result['recommendations'], 1):
-                    st.markdown(f"{i}. {rec}")
-                
-                st.markdown('</div>', unsafe_allow_html=True)
+                show_image_report(analysis)
             else:
                 st.error(f"❌ Analysis failed: {analysis['error']}")
+        
+        with col1:
+            if analysis['success']:
+                # The cached thumbnail, not the full-resolution upload
+                st.image(analysis['thumbnail'], caption="📸 Uploaded Image", use_container_width=True)
+        return
+    
+    progress = st.progress(0.0, text="🔍 AI Multimodal Analysis in Progress...")
+    reports = analyze_multimodal_images(
+        uploaded_files, lambda done, total: progress.progress(done / total, text=f"🔍 Analyzed {done}/{total} images")
+    )
+    progress.empty()
+    
+    failed = [r for r in reports if not r['success']]
+    reports = [r for r in reports if r['success']]
+    if failed:
+        st.warning(f"⚠️ {len(failed)} files could not be analyzed: "
+                   + ", ".join(r['file_info']['name'] for r in failed[:5]))
+    if not reports:
+        return
+    
+    summary = pd.DataFrame([{
+        'File': r['file_info']['name'],
+        'Category': r['analysis']['category'],
+        'Tourism Potential': round(r['analysis']['tourism_potential'], 1),
+        'Sustainability': round(r['analysis']['sustainability_score'], 1),
+        'Category Score %': round(r['enhanced_metrics']['category_score'], 1),
+        'Green Cover %': round(100 * r['features']['green_cover'], 1),
+        'Processing': r['enhanced_metrics']['processing_time'],
+        'Source': r['source']
+    } for r in reports])
+    
+    st.markdown(f"#### 🧠 **{len(reports)} Images Analyzed** • "
+                f"{sum(r['source'] == 'new' for r in reports)} new • "
+                f"{sum(r['source'] == 'near-duplicate' for r in reports)} near-duplicates • "
+                f"{sum(r['source'] == 'cache' for r in reports)} from cache")
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    
+    # Paginated thumbnail grid
+    pages = -(-len(reports) // IMAGES_PER_PAGE)
+    page = st.number_input("📄 Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    visible = reports[(page - 1) * IMAGES_PER_PAGE:page * IMAGES_PER_PAGE]
+    for start in range(0, len(visible), 4):
+        for col, report in zip(st.columns(4), visible[start:start + 4]):
+            with col:
+                st.image(report['thumbnail'], use_container_width=True,
+                         caption=f"{report['file_info']['name']} • {report['analysis']['category'].split()[0]} • "
+                                 f"{report['analysis']['tourism_potential']:.1f}/10")
+    
+    selected = st.selectbox("🔎 Detailed results", [r['file_info']['name'] for r in reports])
+    show_image_report(next(r for r in reports if r['file_info']['name'] == selected))
 
 def show_sustainability_intelligence():
     """Enhanced sustainability intelligence center"""
@@ -847,6 +1496,8 @@ def show_sustainability_intelligence():
             st.metric(label, value, delta)
             st.markdown('</div>', unsafe_allow_html=True)
     
+    show_metric_anomalies()
+    
     # Enhanced initiatives tracking
     st.markdown("#### 🎯 ACTIVE SUSTAINABILITY INITIATIVES")
     
@@ -873,6 +1524,130 @@ def show_sustainability_intelligence():
             with metrics_col:
                 st.markdown(f"**💰 Annual Savings:** {init['savings']}")
                 st.markdown(f"**🌍 Environmental Impact:** {init['impact']}")
+    
+    show_capacity_planner()
+
+def show_metric_anomalies():
+    """Latest live-metric samples outside their normal bounds"""
+    st.markdown("#### 🚨 METRIC ANOMALIES")
+    monitor = refresh_anomalies()
+    anomalies = monitor.events().head(ANOMALY_LIST_ROWS)
+    st.caption(f"{monitor.samples:,} samples tested across {len(monitor.detector)} series; "
+               f"flagged beyond {ANOMALY_THRESHOLD:g} robust standard deviations of the recent level "
+               f"or of the usual value for the time of day")
+    if anomalies.empty:
+        st.success("✅ No metric outside its normal bounds")
+        return
+    anomalies['timestamp'] = epoch_to_local(anomalies['timestamp'].to_numpy())
+    st.dataframe(anomalies.style.format({'value': '{:,.2f}', 'expected': '{:,.2f}', 'z': '{:+.1f}'}),
+                 use_container_width=True, hide_index=True)
+
+def show_capacity_planner():
+    """Side-by-side visitor-flow scenarios over next month's forecast demand"""
+    st.markdown("#### 🚦 VISITOR FLOW & CARRYING CAPACITY")
+    sites, month = capacity_sites(measured_carbon_per_visitor())
+    st.caption(f"Hourly slot plan for {month.strftime('%B %Y')} across {len(sites):,} sites, "
+               f"from the visitor demand forecast")
+    
+    scenarios = {}
+    for col, (name, defaults) in zip(st.columns(len(CAPACITY_SCENARIOS)), CAPACITY_SCENARIOS.items()):
+        with col:
+            st.markdown(f"**{name}**")
+            scenarios[name] = {
+                'capacity_scale': st.slider("Capacity ×", 0.5, 2.0, defaults['capacity_scale'], 0.05,
+                                            key=f"{name}_capacity"),
+                'shift_hours': st.slider("Shift window (hours)", 0, 6, defaults['shift_hours'], key=f"{name}_shift"),
+                'carbon_budget': st.slider("Carbon budget (share of uncapped)", 0.5, 1.0, defaults['carbon_budget'],
+                                           0.05, key=f"{name}_carbon")
+            }
+    
+    comparison = compare_scenarios(sites, month, scenarios)
+    fig = go.Figure([
+        go.Bar(x=comparison['scenario'], y=comparison[column], name=label, marker_color=color)
+        for column, label, color in (('served', 'Served', '#00ff88'),
+                                     ('lost_to_capacity', 'Turned away: capacity', '#ffaa44'),
+                                     ('lost_to_carbon_cap', 'Turned away: carbon cap', '#ff6666'))
+    ])
+    fig.update_layout(
+        barmode='stack',
+        title="Visitors Served per Scenario",
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(0,0,0,0)', 
+        font_color='#66ff99',
+        legend=dict(bgcolor='rgba(0,0,0,0)')
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(comparison.style.format({
+        'served': '{:,.0f}', 'served_share': '{:.1%}', 'lost_to_capacity': '{:,.0f}',
+        'lost_to_carbon_cap': '{:,.0f}', 'shifted_visitor_hours': '{:,.0f}', 'emissions': '{:,.0f}'
+    }), use_container_width=True, hide_index=True)
+
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", 8))
+
+def show_batch_analysis():
+    """Run a CSV of scenarios through the analysis frameworks concurrently"""
+    st.subheader("🗂️ BATCH SCENARIO ANALYSIS")
+    
+    st.markdown(f"*Upload a CSV with a `query` column and an optional `analysis_type` column "
+                f"({', '.join(ANALYSIS_TYPES)})*")
+    
+    uploaded = st.file_uploader("📄 Upload scenarios CSV", type=['csv'])
+    if uploaded is None:
+        return
+    
+    try:
+        batch = read_batch_csv(uploaded, ANALYSIS_TYPES)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+    
+    st.caption(f"📋 {len(batch)} scenarios • up to {BATCH_MAX_WORKERS} concurrent requests")
+    
+    if st.button("🚀 Run Batch Analysis") and len(batch):
+        progress = st.progress(0.0, text="Starting batch...")
+        table = st.empty()
+        results = []
+        last_draw = 0.0
+        start = datetime.now()
+        
+        # Everything Streamlit-cached is resolved here; the worker threads only use what they are given
+        services = ai_services()
+        passages = {query: retrieve_passages(query) for query in batch['query'].unique()}
+        routed = {services['router'].route(query)[0] if analysis_type == "general" else analysis_type
+                  for query, analysis_type in zip(batch['query'], batch['analysis_type'])}
+        if not services['config']['active'] and "intra_variable" in routed:
+            services['path_model'] = fit_site_path_model()
+        
+        def analyze(query, analysis_type):
+            return get_enhanced_ai_response(query, analysis_type, fallback=False, services=services,
+                                            passages=passages[query])
+        
+        for result in run_batch(zip(batch['query'], batch['analysis_type']), analyze, BATCH_MAX_WORKERS):
+            results.append(result)
+            # Redraw at most a few times a second; always draw the final state
+            now = datetime.now().timestamp()
+            if now - last_draw > 0.25 or len(results) == len(batch):
+                last_draw = now
+                progress.progress(len(results) / len(batch), text=f"{len(results)}/{len(batch)} complete")
+                table.dataframe(results_frame(results).drop(columns='response'), use_container_width=True)
+        
+        st.session_state['batch_results'] = results
+        st.success(f"✅ {len(results)} scenarios analyzed in {(datetime.now() - start).total_seconds():.1f}s")
+    
+    results = st.session_state.get('batch_results')
+    if results:
+        frame = results_frame(results)
+        failed = int((frame['status'] != "ok").sum())
+        if failed:
+            st.warning(f"⚠️ {failed} scenarios failed; see the status column")
+        st.dataframe(frame, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("⬇️ Download CSV", frame.to_csv(index=False), "batch_analysis.csv", "text/csv")
+        with col2:
+            st.download_button("⬇️ Download JSONL", results_to_jsonl(results), "batch_analysis.jsonl",
+                               "application/x-ndjson")
 
 # Enhanced footer with system status
 def show_enhanced_footer():
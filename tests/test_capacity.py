@@ -0,0 +1,23 @@
+"""Visitor-flow allocation against capacity"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecotourism.capacity import allocate  # noqa: E402
+
+
+def test_shift_serves_everyone_when_a_plan_exists():
+    # Hour 1 must move to hour 0 and hour 3 to hour 2; nearest-hour-later-first loses one
+    served, lost, shifted = allocate(np.array([[1, 2, 1, 2, 1.]]), np.array([[2, 1, 2, 1, 1.]]), shift_hours=1)
+    assert lost[0] == 0
+    assert served.sum() == 7
+    assert shifted[0] == 2
+
+
+def test_overflow_never_moves_beyond_the_window():
+    served, lost, _ = allocate(np.array([[3, 0.5, 0.5, 1.]]), np.array([[1, 1, 1, 1.]]), shift_hours=1)
+    assert served.tolist() == [[1, 1, 0.5, 1]]
+    assert lost[0] == 1.5
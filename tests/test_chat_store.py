@@ -0,0 +1,24 @@
+"""Chat history retention"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecotourism.chat_store import ChatStore  # noqa: E402
+
+
+def test_prune_drops_idle_and_excess_conversations():
+    store = ChatStore(":memory:")
+    for session in ("old", "a", "b", "c"):
+        store.append(session, "user", f"hello from {session}")
+        time.sleep(0.01)
+    store._db.execute("UPDATE messages SET created_at = created_at - 7200 WHERE session = 'old'")
+    store._db.execute("INSERT INTO summaries VALUES ('old', 16, 'summary')")
+
+    assert store.prune(max_age_seconds=3600) == 1
+    assert store.count("old") == 0
+    assert store._db.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] == 0
+
+    assert store.prune(max_sessions=2) == 1
+    assert [store.count(s) for s in ("a", "b", "c")] == [0, 1, 1]
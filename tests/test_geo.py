@@ -0,0 +1,33 @@
+"""Grid index queries against a brute-force scan"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecotourism.geo import GridIndex, haversine_km  # noqa: E402
+
+RNG = np.random.default_rng(0)
+LAT = RNG.uniform(-89, 89, 20000)
+LON = RNG.uniform(-180, 180, 20000)
+INDEX = GridIndex(LAT, LON)
+
+
+@pytest.mark.parametrize("longitude", [179.9, -179.9, 178.5, -178.5, 0.0])
+def test_radius_matches_haversine_across_the_antimeridian(longitude):
+    for latitude, radius in [(0.0, 400.0), (-45.0, 800.0), (70.0, 300.0)]:
+        expected = np.flatnonzero(haversine_km(latitude, longitude, LAT, LON) <= radius)
+        assert np.array_equal(np.sort(INDEX.query_radius(latitude, longitude, radius)), expected)
+
+
+def test_bbox_with_lon_min_above_lon_max_wraps():
+    expected = np.flatnonzero((LAT >= -10) & (LAT <= 10) & ((LON >= 170) | (LON <= -170)))
+    assert len(expected) > 0
+    assert np.array_equal(INDEX.query_bbox(-10, 10, 170, -170), expected)
+
+
+def test_plain_bbox_is_unchanged():
+    expected = np.flatnonzero((LAT >= -10) & (LAT <= 10) & (LON >= -20) & (LON <= 20))
+    assert np.array_equal(INDEX.query_bbox(-10, 10, -20, 20), expected)
@@ -0,0 +1,66 @@
+"""The Intra-Variable page over file-backed history sources, and incremental correlations"""
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ecotourism.correlation import StreamingCovariance, correlation_report  # noqa: E402
+from ecotourism.data_sources import CSVSource, SQLiteSource  # noqa: E402
+from ecotourism.synthetic import generate_synthetic_history  # noqa: E402
+
+COLUMNS = ['sustainability_score', 'satisfaction_score', 'monthly_revenue', 'carbon_footprint',
+           'community_impact', 'monthly_visitors']
+
+
+def write_history(kind, path, history):
+    if kind == "csv":
+        history.to_csv(path, index=False)
+    else:
+        with sqlite3.connect(path) as conn:
+            history.to_sql("sites", conn, index=False)
+
+
+@pytest.mark.parametrize("kind", ["csv", "sqlite"])
+def test_intra_variable_page_on_file_history(kind, tmp_path, monkeypatch):
+    path = str(tmp_path / f"history.{kind}")
+    write_history(kind, path, generate_synthetic_history(50, 12, 0))
+    monkeypatch.setenv("TOURISM_HISTORY_SOURCE", kind)
+    monkeypatch.setenv("TOURISM_HISTORY_PATH", path)
+    monkeypatch.setenv("TOURISM_HISTORY_TABLE", "sites")
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    at = AppTest.from_file(os.path.join(ROOT, "main-app.py"), default_timeout=300).run()
+    at.sidebar.selectbox[0].select("📈 Intra-Variable Effects").run()
+    assert not at.exception
+    assert not at.error
+
+
+@pytest.mark.parametrize("kind", ["csv", "sqlite"])
+def test_watermark_month_rows_added_later_are_folded_in(kind, tmp_path):
+    history = generate_synthetic_history(40, 6, 0)
+    newest = history['month'].max()
+    late = history['month'].eq(newest) & (history['site_id'] % 2 == 1)
+    path = str(tmp_path / f"history.{kind}")
+    source = CSVSource(path) if kind == "csv" else SQLiteSource(path)
+    load = lambda since: source.load(['month', *COLUMNS], None if since is None else [('month', '>=', since)])
+
+    moments = StreamingCovariance(COLUMNS)
+    write_history(kind, path, history[~late])
+    moments.update_from(load, 'month')
+    os.remove(path)
+    write_history(kind, path, history)
+    moments.update_from(load, 'month')
+
+    expected = correlation_report(history, COLUMNS)
+    assert moments.n == len(history)
+    assert moments.watermark == newest
+    np.testing.assert_allclose(moments.report()['pearson'], expected['pearson'], atol=1e-9)
@@ -0,0 +1,26 @@
+"""Query intent routing"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecotourism.intent import GENERAL_CHECKS, default_router  # noqa: E402
+
+ROUTER = default_router()
+
+
+@pytest.mark.parametrize("query", GENERAL_CHECKS)
+def test_everyday_questions_go_to_general(query):
+    assert ROUTER.route(query)[0] == 'general'
+
+
+@pytest.mark.parametrize("query, intent", [
+    ("Could competitors copy our guide network?", 'vrio'),
+    ("What is the correlation between visitor numbers and revenue?", 'intra_variable'),
+    ("New tax law for homestays", 'pestel'),
+    ("Analyze this photo of Bali", 'multimodal'),
+])
+def test_framework_questions_keep_their_intent(query, intent):
+    assert ROUTER.route(query)[0] == intent
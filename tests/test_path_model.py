@@ -0,0 +1,20 @@
+"""Bootstrap draws of the path model"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ecotourism import path_model  # noqa: E402
+
+
+def test_draws_do_not_depend_on_worker_count(monkeypatch):
+    monkeypatch.setattr(path_model, 'PARALLEL_THRESHOLD', 0)
+    z = np.random.default_rng(1).standard_normal((2000, 4))
+    equations = path_model._equations(list(range(4)), {0: [1], 2: [0, 3]})
+    serial = path_model.bootstrap_coefficients(z, equations, 70, seed=7, workers=1)
+    for workers in (2, 3):
+        pooled = path_model.bootstrap_coefficients(z, equations, 70, seed=7, workers=workers)
+        # Same weights per block; only float32 BLAS rounding may differ between processes
+        np.testing.assert_allclose(pooled, serial, rtol=1e-5, atol=1e-6)